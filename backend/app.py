@@ -1,18 +1,34 @@
 import os
+import click
 from flask import Flask
 from dotenv import load_dotenv
 from flask_migrate import Migrate
 from backend.database import db
+from backend.utils.serialization import FastJSONProvider
 
 # Load environment variables from .env file in backend directory
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'), override=True)
 
 migrate = Migrate()
 
+def _serving_requests():
+    # False when the app is built for a `flask` CLI command other than `run`
+    # (migrations, cron jobs, `flask export worker`), which must not start
+    # background threads
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.info_name == 'run'
+
 def create_app():
     app = Flask(__name__)
+    # orjson-backed jsonify() when orjson is installed
+    app.json = FastJSONProvider(app)
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Seconds between in-process overdue sweeps (0 disables; use `flask invoices sweep-overdue` from cron instead)
+    app.config['OVERDUE_SWEEP_INTERVAL'] = int(os.getenv('OVERDUE_SWEEP_INTERVAL', '0'))
+    # Seconds between export queue polls in this web process (0 disables). Every
+    # web worker would run exports, so prefer a separate `flask export worker`.
+    app.config['EXPORT_WORKER_INTERVAL'] = float(os.getenv('EXPORT_WORKER_INTERVAL', '0'))
 
     # Initialize extensions
     db.init_app(app)
@@ -20,7 +36,7 @@ def create_app():
 
     # Import models WITHIN app context to avoid circular imports
     with app.app_context():
-        from backend.models import user, team, teammembership, client, invoice
+        from backend.models import user, team, teammembership, client, invoice, teaminvoicestats, invoicecounter, exportjob
         
         # Create tables if they don't exist (for development)
         db.create_all()
@@ -40,6 +56,18 @@ def create_app():
     app.register_blueprint(export_bp, url_prefix='/api/export')
     app.register_blueprint(teams_bp, url_prefix='/api/teams')
 
+    if not _serving_requests():
+        return app
+    with app.app_context():
+        from backend.utils.invoice_stats import ensure_invoice_stats
+        ensure_invoice_stats()
+    if app.config['OVERDUE_SWEEP_INTERVAL'] > 0:
+        from backend.utils.invoice_query import start_overdue_sweeper
+        start_overdue_sweeper(app, app.config['OVERDUE_SWEEP_INTERVAL'])
+    if app.config['EXPORT_WORKER_INTERVAL'] > 0:
+        from backend.utils.export_jobs import start_export_worker
+        start_export_worker(app, app.config['EXPORT_WORKER_INTERVAL'])
+
     return app
 
 if __name__ == '__main__':
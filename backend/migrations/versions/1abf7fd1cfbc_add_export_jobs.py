@@ -0,0 +1,44 @@
+"""Add export jobs
+
+Revision ID: 1abf7fd1cfbc
+Revises: 47a12df55017
+Create Date: 2026-10-18 13:05:22.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1abf7fd1cfbc'
+down_revision = '47a12df55017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'export_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('teams.id'), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('total', sa.Integer()),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String()),
+        sa.Column('artifact_path', sa.String()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('started_at', sa.DateTime()),
+        sa.Column('heartbeat_at', sa.DateTime()),
+        sa.Column('finished_at', sa.DateTime()),
+        if_not_exists=True
+    )
+    op.create_index('ix_export_jobs_status_id', 'export_jobs', ['status', 'id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_export_jobs_status_id', table_name='export_jobs', if_exists=True)
+    op.drop_table('export_jobs', if_exists=True)
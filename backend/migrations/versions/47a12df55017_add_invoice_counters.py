@@ -0,0 +1,32 @@
+"""Add per-team invoice number counters
+
+Revision ID: 47a12df55017
+Revises: 8adc365c0543
+Create Date: 2026-10-18 10:41:07.552913
+
+Counters are seeded lazily from the team's highest existing number on the
+first allocation, so no data migration is needed.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '47a12df55017'
+down_revision = '8adc365c0543'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'invoice_counters',
+        sa.Column('team_id', sa.Integer(), sa.ForeignKey('teams.id'), primary_key=True),
+        sa.Column('last_number', sa.Integer(), nullable=False),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_counters', if_exists=True)
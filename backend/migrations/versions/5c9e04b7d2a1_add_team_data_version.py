@@ -0,0 +1,32 @@
+"""Add team data version
+
+Revision ID: 5c9e04b7d2a1
+Revises: ea2d2fd3ae78
+Create Date: 2026-10-18 15:03:36.118052
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c9e04b7d2a1'
+down_revision = 'ea2d2fd3ae78'
+branch_labels = None
+depends_on = None
+
+
+def _team_columns():
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns('teams')}
+
+
+def upgrade():
+    # db.create_all() adds the column on fresh databases
+    if 'data_version' not in _team_columns():
+        op.add_column('teams', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    if 'data_version' in _team_columns():
+        with op.batch_alter_table('teams') as batch_op:
+            batch_op.drop_column('data_version')
@@ -0,0 +1,48 @@
+"""Add indexes for the hot query paths
+
+Revision ID: 8adc365c0543
+Revises:
+Create Date: 2026-10-18 09:12:41.318204
+
+Tables are still created by db.create_all() at startup, which also builds
+these indexes on fresh databases, so every index is created IF NOT EXISTS.
+The unique (team_id, number) index fails if a team already has duplicate
+invoice numbers; renumber those rows before upgrading.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8adc365c0543'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_invoices_team_id_created_at_id', 'invoices', ['team_id', 'created_at', 'id'], if_not_exists=True)
+    op.create_index('ix_invoices_team_id_status_due_date', 'invoices', ['team_id', 'status', 'due_date'], if_not_exists=True)
+    op.create_index('ix_invoices_team_id_client_id', 'invoices', ['team_id', 'client_id'], if_not_exists=True)
+    op.create_index('uq_invoices_team_id_number', 'invoices', ['team_id', 'number'], unique=True, if_not_exists=True)
+    op.create_index(
+        'ix_invoices_unpaid_due_date', 'invoices', ['due_date'],
+        postgresql_where=sa.text("status = 'unpaid'"),
+        sqlite_where=sa.text("status = 'unpaid'"),
+        if_not_exists=True
+    )
+    op.create_index('ix_clients_team_id_id', 'clients', ['team_id', 'id'], if_not_exists=True)
+    op.create_index('uq_team_memberships_user_id_team_id', 'team_memberships', ['user_id', 'team_id'], unique=True, if_not_exists=True)
+    op.create_index('ix_team_memberships_team_id', 'team_memberships', ['team_id'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_team_memberships_team_id', table_name='team_memberships', if_exists=True)
+    op.drop_index('uq_team_memberships_user_id_team_id', table_name='team_memberships', if_exists=True)
+    op.drop_index('ix_clients_team_id_id', table_name='clients', if_exists=True)
+    op.drop_index('ix_invoices_unpaid_due_date', table_name='invoices', if_exists=True)
+    op.drop_index('uq_invoices_team_id_number', table_name='invoices', if_exists=True)
+    op.drop_index('ix_invoices_team_id_client_id', table_name='invoices', if_exists=True)
+    op.drop_index('ix_invoices_team_id_status_due_date', table_name='invoices', if_exists=True)
+    op.drop_index('ix_invoices_team_id_created_at_id', table_name='invoices', if_exists=True)
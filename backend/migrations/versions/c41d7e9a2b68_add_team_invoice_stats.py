@@ -0,0 +1,58 @@
+"""Add team invoice stats rollup
+
+Revision ID: c41d7e9a2b68
+Revises: 5c9e04b7d2a1
+Create Date: 2026-10-18 21:14:52.903417
+
+db.create_all() may already have created the table with a float
+total_amount; it is converted to NUMERIC(14, 2) in place. Either way the
+rollup is then recomputed from the invoices table, and every team's data
+version is bumped so cached dashboard responses are dropped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2b68'
+down_revision = '5c9e04b7d2a1'
+branch_labels = None
+depends_on = None
+
+
+def _backfill():
+    # Same rows as backend.utils.invoice_stats.rebuild_invoice_stats()
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "CAST(date_trunc('month', created_at) AS DATE)"
+    else:
+        month = "date(created_at, 'start of month')"
+    op.execute('DELETE FROM team_invoice_stats')
+    op.execute(
+        'INSERT INTO team_invoice_stats (team_id, currency, status, month, invoice_count, total_amount) '
+        f"SELECT team_id, COALESCE(currency, 'MAD'), COALESCE(status, 'unpaid'), {month}, "
+        'COUNT(id), COALESCE(SUM(amount), 0) FROM invoices '
+        'WHERE team_id IS NOT NULL AND created_at IS NOT NULL GROUP BY 1, 2, 3, 4'
+    )
+    op.execute('UPDATE teams SET data_version = data_version + 1')
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('team_invoice_stats'):
+        with op.batch_alter_table('team_invoice_stats') as batch_op:
+            batch_op.alter_column('total_amount', type_=sa.Numeric(14, 2), existing_nullable=False)
+    else:
+        op.create_table(
+            'team_invoice_stats',
+            sa.Column('team_id', sa.Integer(), sa.ForeignKey('teams.id'), primary_key=True),
+            sa.Column('currency', sa.String(), primary_key=True),
+            sa.Column('status', sa.String(), primary_key=True),
+            sa.Column('month', sa.Date(), primary_key=True),
+            sa.Column('invoice_count', sa.Integer(), nullable=False),
+            sa.Column('total_amount', sa.Numeric(14, 2), nullable=False)
+        )
+    _backfill()
+
+
+def downgrade():
+    op.drop_table('team_invoice_stats', if_exists=True)
@@ -0,0 +1,32 @@
+"""Extend the invoice client index with the listing order
+
+Revision ID: e8f2a5c19d37
+Revises: c41d7e9a2b68
+Create Date: 2026-10-18 21:52:09.470183
+
+The client-filtered listing sorts by (created_at, id); with those columns in
+the index it reads one page of rows instead of every invoice of the client.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f2a5c19d37'
+down_revision = 'c41d7e9a2b68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_invoices_team_id_client_id_created_at_id', 'invoices', ['team_id', 'client_id', 'created_at', 'id'],
+        if_not_exists=True
+    )
+    op.drop_index('ix_invoices_team_id_client_id', table_name='invoices', if_exists=True)
+
+
+def downgrade():
+    op.create_index('ix_invoices_team_id_client_id', 'invoices', ['team_id', 'client_id'], if_not_exists=True)
+    op.drop_index('ix_invoices_team_id_client_id_created_at_id', table_name='invoices', if_exists=True)
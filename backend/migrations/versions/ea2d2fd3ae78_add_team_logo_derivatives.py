@@ -0,0 +1,39 @@
+"""Add team logo derivatives
+
+Revision ID: ea2d2fd3ae78
+Revises: 1abf7fd1cfbc
+Create Date: 2026-10-18 14:22:51.907346
+
+Existing logos keep working through the legacy path until
+`flask teams process-logos` generates their derivatives.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ea2d2fd3ae78'
+down_revision = '1abf7fd1cfbc'
+branch_labels = None
+depends_on = None
+
+
+def _team_columns():
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns('teams')}
+
+
+def upgrade():
+    # db.create_all() adds these columns on fresh databases
+    existing = _team_columns()
+    for name in ('logo_pdf', 'logo_thumb'):
+        if name not in existing:
+            op.add_column('teams', sa.Column(name, sa.String()))
+
+
+def downgrade():
+    existing = _team_columns()
+    with op.batch_alter_table('teams') as batch_op:
+        for name in ('logo_thumb', 'logo_pdf'):
+            if name in existing:
+                batch_op.drop_column(name)
@@ -0,0 +1,25 @@
+from backend.database import db
+from datetime import datetime
+
+class ExportJob(db.Model):
+    # Background export request, claimed and run by backend.utils.export_jobs
+    __tablename__ = 'export_jobs'
+    __table_args__ = (
+        # Worker claim: oldest queued job first
+        db.Index('ix_export_jobs_status_id', 'status', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    kind = db.Column(db.String, nullable=False)  # 'csv' or 'zip'
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String, nullable=False, default='queued')  # queued, running, done, failed
+    total = db.Column(db.Integer)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String)
+    artifact_path = db.Column(db.String)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
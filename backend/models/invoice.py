@@ -3,6 +3,21 @@ from datetime import datetime
 
 class Invoice(db.Model):
     __tablename__ = 'invoices'
+    __table_args__ = (
+        # Keyset listing and created_at range scans
+        db.Index('ix_invoices_team_id_created_at_id', 'team_id', 'created_at', 'id'),
+        # Status filters and the per-team pending-overdue lookup
+        db.Index('ix_invoices_team_id_status_due_date', 'team_id', 'status', 'due_date'),
+        # Client filter on the keyset listing, already in page order
+        db.Index('ix_invoices_team_id_client_id_created_at_id', 'team_id', 'client_id', 'created_at', 'id'),
+        db.Index('uq_invoices_team_id_number', 'team_id', 'number', unique=True),
+        # Global overdue sweep
+        db.Index(
+            'ix_invoices_unpaid_due_date', 'due_date',
+            postgresql_where=db.text("status = 'unpaid'"),
+            sqlite_where=db.text("status = 'unpaid'")
+        ),
+    )
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'))
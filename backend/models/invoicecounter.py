@@ -0,0 +1,7 @@
+from backend.database import db
+
+class InvoiceCounter(db.Model):
+    # Last invoice number handed out per team, see backend.utils.invoice_numbers
+    __tablename__ = 'invoice_counters'
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
@@ -6,6 +6,11 @@ class Team(db.Model):
     name = db.Column(db.String, nullable=False)
     owner_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     logo_url = db.Column(db.String)
+    # Content-addressed derivatives in the uploads folder, see backend.utils.logos
+    logo_pdf = db.Column(db.String)
+    logo_thumb = db.Column(db.String)
+    # Bumped on every client or invoice write; drives ETags, see backend.utils.data_version
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # Relationships
     memberships = db.relationship('TeamMembership', back_populates='team')
     owner = db.relationship('User', foreign_keys=[owner_id]) 
\ No newline at end of file
@@ -0,0 +1,12 @@
+from backend.database import db
+
+class TeamInvoiceStats(db.Model):
+    # Rollup of invoices per team, currency, stored status and creation month.
+    # Maintained by backend.utils.invoice_stats on every invoice write.
+    __tablename__ = 'team_invoice_stats'
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    currency = db.Column(db.String, primary_key=True)
+    status = db.Column(db.String, primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
@@ -2,6 +2,10 @@ from backend.database import db
 
 class TeamMembership(db.Model):
     __tablename__ = 'team_memberships'
+    __table_args__ = (
+        db.Index('uq_team_memberships_user_id_team_id', 'user_id', 'team_id', unique=True),
+        db.Index('ix_team_memberships_team_id', 'team_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'))
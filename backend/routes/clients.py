@@ -1,50 +1,33 @@
 from flask import Blueprint, request, jsonify, abort
-from backend.utils.firebase_auth import verify_firebase_token
+from backend.utils.identity import get_current_team_id, require_user_and_team
 from backend.models.client import Client
-from backend.models.team import Team
-from backend.models.teammembership import TeamMembership
-from backend.models.user import User
 from backend.database import db
+from backend.utils.response_cache import cached_response
+from backend.utils.serialization import NDJSON_BATCH_SIZE, columnar_response, gzip_negotiated, ndjson_response, response_format
+from backend.utils.data_version import bump_data_version, etag_on_data_version
 
 clients_bp = Blueprint('clients', __name__)
+require_user_and_team(clients_bp)
 
-# Helper: get current user and team
-
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+CLIENT_FIELDS = ('id', 'name', 'phone', 'ice', 'if_number')
+CLIENT_COLUMNS = (Client.id, Client.name, Client.phone, Client.ice, Client.if_number)
 
 @clients_bp.route('/', methods=['GET'])
+@gzip_negotiated
+@etag_on_data_version
+@cached_response
 def list_clients():
-    user, team = get_current_user_and_team()
-    clients = Client.query.filter_by(team_id=team.id).all()
+    team_id = get_current_team_id()
+    fmt = response_format()
+    if fmt != 'json':
+        rows = db.session.query(*CLIENT_COLUMNS).filter(Client.team_id == team_id).order_by(Client.id)
+        if fmt == 'ndjson':
+            response = ndjson_response(CLIENT_FIELDS, rows.execution_options(yield_per=NDJSON_BATCH_SIZE))
+        else:
+            response = columnar_response(CLIENT_FIELDS, rows.all())
+        response.vary.add('Accept')
+        return response
+    clients = Client.query.filter_by(team_id=team_id).all()
     return jsonify([{
         'id': c.id,
         'name': c.name,
@@ -55,23 +38,26 @@ def list_clients():
 
 @clients_bp.route('/', methods=['POST'])
 def create_client():
-    user, team = get_current_user_and_team()
+    team_id = get_current_team_id()
     data = request.json
     client = Client(
-        team_id=team.id,
+        team_id=team_id,
         name=data.get('name'),
         phone=data.get('phone'),
         ice=data.get('ice'),
         if_number=data.get('if_number')
     )
     db.session.add(client)
+    bump_data_version(team_id)
     db.session.commit()
     return jsonify({'id': client.id}), 201
 
 @clients_bp.route('/<int:client_id>', methods=['GET'])
+@etag_on_data_version
+@cached_response
 def get_client(client_id):
-    user, team = get_current_user_and_team()
-    client = Client.query.filter_by(id=client_id, team_id=team.id).first()
+    team_id = get_current_team_id()
+    client = Client.query.filter_by(id=client_id, team_id=team_id).first()
     if not client:
         abort(404, 'Client not found')
     return jsonify({
@@ -84,8 +70,8 @@ def get_client(client_id):
 
 @clients_bp.route('/<int:client_id>', methods=['PUT'])
 def update_client(client_id):
-    user, team = get_current_user_and_team()
-    client = Client.query.filter_by(id=client_id, team_id=team.id).first()
+    team_id = get_current_team_id()
+    client = Client.query.filter_by(id=client_id, team_id=team_id).first()
     if not client:
         abort(404, 'Client not found')
     data = request.json
@@ -93,15 +79,17 @@ def update_client(client_id):
     client.phone = data.get('phone', client.phone)
     client.ice = data.get('ice', client.ice)
     client.if_number = data.get('if_number', client.if_number)
+    bump_data_version(team_id)
     db.session.commit()
     return jsonify({'success': True})
 
 @clients_bp.route('/<int:client_id>', methods=['DELETE'])
 def delete_client(client_id):
-    user, team = get_current_user_and_team()
-    client = Client.query.filter_by(id=client_id, team_id=team.id).first()
+    team_id = get_current_team_id()
+    client = Client.query.filter_by(id=client_id, team_id=team_id).first()
     if not client:
         abort(404, 'Client not found')
     db.session.delete(client)
+    bump_data_version(team_id)
     db.session.commit()
     return jsonify({'success': True}) 
\ No newline at end of file
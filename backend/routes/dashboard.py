@@ -1,78 +1,165 @@
-from flask import Blueprint, jsonify, abort
-from backend.utils.firebase_auth import verify_firebase_token
+from flask import Blueprint, request, jsonify, abort
+from backend.utils.identity import get_current_team_id, require_user_and_team
 from backend.models.invoice import Invoice
-from backend.models.teammembership import TeamMembership
-from backend.models.user import User
-from backend.models.team import Team
+from backend.models.teaminvoicestats import TeamInvoiceStats
 from backend.database import db
-from datetime import datetime
-from sqlalchemy import extract, func
+from backend.utils.response_cache import cached_response
+from backend.utils.data_version import etag_on_data_version
+from backend.utils.invoice_stats import GRANULARITIES, bucket_starts, date_bucket, rebuild_invoice_stats
+from backend.utils.invoice_query import effective_status, status_filter
+from datetime import date, datetime
+from sqlalchemy import func
+import click
 
 dashboard_bp = Blueprint('dashboard', __name__)
+require_user_and_team(dashboard_bp)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+STATUSES = ('paid', 'unpaid', 'overdue')
 
 @dashboard_bp.route('/summary', methods=['GET'])
+@etag_on_data_version
+@cached_response
 def summary():
-    user, team = get_current_user_and_team()
-    invoices = Invoice.query.filter_by(team_id=team.id).all()
-    total = len(invoices)
-    paid = sum(1 for i in invoices if i.status == 'paid')
-    unpaid = sum(1 for i in invoices if i.status == 'unpaid')
-    overdue = sum(1 for i in invoices if i.status == 'overdue')
-    total_revenue = sum(i.amount for i in invoices if i.status == 'paid')
-    return jsonify({
-        'total_invoices': total,
-        'paid': paid,
-        'unpaid': unpaid,
-        'overdue': overdue,
-        'total_revenue': total_revenue
-    })
+    team_id = get_current_team_id()
+    # Totals come from the rollup; a handful of rollup rows instead of the invoices
+    rows = db.session.query(
+        TeamInvoiceStats.currency,
+        TeamInvoiceStats.status,
+        func.sum(TeamInvoiceStats.invoice_count),
+        func.sum(TeamInvoiceStats.total_amount)
+    ).filter(
+        TeamInvoiceStats.team_id == team_id
+    ).group_by(TeamInvoiceStats.currency, TeamInvoiceStats.status).all()
+    # Unpaid invoices past due that the sweeper has not flipped yet still read as overdue
+    pending_overdue = db.session.query(
+        Invoice.currency,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.amount), 0)
+    ).filter(
+        Invoice.team_id == team_id,
+        Invoice.status == 'unpaid',
+        Invoice.due_date < datetime.utcnow().date()
+    ).group_by(Invoice.currency).all()
+    result = {'total_invoices': 0, 'paid': 0, 'unpaid': 0, 'overdue': 0, 'by_currency': {}, 'revenue_by_currency': {}}
+
+    def bucket_for(currency):
+        return result['by_currency'].setdefault(currency or 'MAD', {
+            'total_invoices': 0,
+            **{s: 0 for s in STATUSES},
+            **{f'{s}_amount': 0.0 for s in STATUSES}
+        })
+
+    for currency, inv_status, count, amount in rows:
+        count = int(count or 0)
+        if not count:
+            continue
+        bucket = bucket_for(currency)
+        bucket['total_invoices'] += count
+        result['total_invoices'] += count
+        if inv_status in STATUSES:
+            bucket[inv_status] += count
+            bucket[f'{inv_status}_amount'] += float(amount or 0)
+            result[inv_status] += count
+    for currency, count, amount in pending_overdue:
+        bucket = bucket_for(currency)
+        for inv_status, sign in (('unpaid', -1), ('overdue', 1)):
+            bucket[inv_status] += sign * count
+            bucket[f'{inv_status}_amount'] += sign * float(amount)
+            result[inv_status] += sign * count
+    for bucket in result['by_currency'].values():
+        for inv_status in STATUSES:
+            bucket[f'{inv_status}_amount'] = round(bucket[f'{inv_status}_amount'], 2)
+    result['revenue_by_currency'] = {c: b['paid_amount'] for c, b in result['by_currency'].items()}
+    return jsonify(result)
 
 @dashboard_bp.route('/monthly-revenue', methods=['GET'])
+@etag_on_data_version
+@cached_response
 def monthly_revenue():
-    user, team = get_current_user_and_team()
+    team_id = get_current_team_id()
     year = datetime.utcnow().year
     # Group by month, sum paid invoices
     monthly = db.session.query(
-        extract('month', Invoice.created_at).label('month'),
-        func.sum(Invoice.amount)
+        TeamInvoiceStats.month,
+        func.sum(TeamInvoiceStats.total_amount)
     ).filter(
-        Invoice.team_id == team.id,
-        Invoice.status == 'paid',
-        extract('year', Invoice.created_at) == year
-    ).group_by('month').order_by('month').all()
+        TeamInvoiceStats.team_id == team_id,
+        TeamInvoiceStats.status == 'paid',
+        TeamInvoiceStats.month >= date(year, 1, 1),
+        TeamInvoiceStats.month < date(year + 1, 1, 1)
+    ).group_by(TeamInvoiceStats.month).order_by(TeamInvoiceStats.month).all()
     # Format as {month: revenue}
-    result = {int(month): float(amount) for month, amount in monthly}
+    result = {month.month: float(amount) for month, amount in monthly if amount}
     return jsonify(result)
 
+MAX_SERIES_BUCKETS = 1000
+
+@dashboard_bp.route('/revenue-series', methods=['GET'])
+@etag_on_data_version
+@cached_response
+def revenue_series():
+    team_id = get_current_team_id()
+    today = datetime.utcnow().date()
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        abort(400, f'granularity must be one of {", ".join(GRANULARITIES)}')
+    try:
+        start = date.fromisoformat(request.args.get('from', date(today.year, 1, 1).isoformat()))
+        end = date.fromisoformat(request.args.get('to', date(today.year + 1, 1, 1).isoformat()))
+    except ValueError:
+        abort(400, 'from and to must be YYYY-MM-DD dates')
+    if end <= start:
+        abort(400, 'to must be after from')
+    buckets = []
+    for bucket in bucket_starts(granularity, start, end):
+        buckets.append(bucket)
+        if len(buckets) > MAX_SERIES_BUCKETS:
+            abort(400, f'Range spans more than {MAX_SERIES_BUCKETS} buckets, use a coarser granularity')
+    bucket = date_bucket(granularity, Invoice.created_at).label('bucket')
+    status = effective_status(today).label('status')
+    # Plain range predicates on created_at so the (team_id, created_at) index applies
+    query = db.session.query(
+        bucket,
+        Invoice.currency,
+        status,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.amount), 0)
+    ).filter(
+        Invoice.team_id == team_id,
+        Invoice.created_at >= datetime.combine(start, datetime.min.time()),
+        Invoice.created_at < datetime.combine(end, datetime.min.time())
+    )
+    if request.args.get('status'):
+        query = query.filter(status_filter(request.args['status'].split(','), today))
+    if request.args.get('currency'):
+        query = query.filter(Invoice.currency == request.args['currency'])
+    rows = query.group_by(bucket, Invoice.currency, status).all()
+    # Fill empty buckets server-side: every series has one value per bucket
+    index = {b: i for i, b in enumerate(buckets)}
+    series = {}
+    for bucket_start, currency, inv_status, count, amount in rows:
+        i = index.get(date.fromisoformat(str(bucket_start)[:10]))
+        if i is None:
+            continue
+        entry = series.setdefault(currency or 'MAD', {}).setdefault(inv_status, {
+            'count': [0] * len(buckets),
+            'amount': [0.0] * len(buckets)
+        })
+        entry['count'][i] += count
+        entry['amount'][i] += float(amount)
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'buckets': [b.isoformat() for b in buckets],
+        'series': series
+    })
+
+@dashboard_bp.cli.command('rebuild-stats')
+@click.option('--team-id', type=int, default=None, help='Only rebuild this team')
+def rebuild_stats_command(team_id):
+    """Recompute the team_invoice_stats rollup from the invoices table."""
+    rebuild_invoice_stats(team_id)
+    print('Rebuilt invoice stats' + (f' for team {team_id}' if team_id else ''))
+
 # Endpoints to be implemented 
\ No newline at end of file
@@ -1,99 +1,171 @@
-from flask import Blueprint, jsonify, send_file, abort
-from backend.utils.firebase_auth import verify_firebase_token
-from backend.models.invoice import Invoice
-from backend.models.client import Client
-from backend.models.teammembership import TeamMembership
-from backend.models.user import User
-from backend.models.team import Team
+from flask import Blueprint, Response, abort, current_app, jsonify, request, send_file, stream_with_context, url_for
+from backend.utils.identity import get_current_user_and_team, get_current_team_id, require_user_and_team
 from backend.database import db
-from backend.utils.pdf import render_invoice_pdf
-import io
-import csv
-import zipfile
+from backend.utils.pdf import invoice_pdf_payload, render_invoice_pdf_payload, render_invoices_pdf, team_logo_src
+from backend.utils.render_pool import check_render_capacity, render_batch_pdf, render_pdfs
+from backend.utils.pdf_cache import pdf_cache
+from backend.utils.exports import invoice_csv_query, invoice_zip_query, iter_invoices_csv, iter_zip
+from backend.models.team import Team
+from backend.models.exportjob import ExportJob
+from backend.utils.export_jobs import EXPORT_KINDS, enqueue_export_job, purge_export_jobs, run_export_worker
+from datetime import datetime, timedelta
+import click
 import os
+import time
 
 export_bp = Blueprint('export', __name__)
+require_user_and_team(export_bp)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+ZIP_BATCH_SIZE = 200
+# Upper bound on invoices in one combined PDF; larger sets go through the ZIP export
+MAX_BATCH_PDF_INVOICES = int(os.getenv('MAX_BATCH_PDF_INVOICES', '500'))
+# Operator-only cache counters; any signed-in user could read them, so off by default
+PDF_CACHE_STATS_ENDPOINT = int(os.getenv('PDF_CACHE_STATS_ENDPOINT', '0'))
 
 @export_bp.route('/invoices/csv', methods=['GET'])
 def export_invoices_csv():
-    user, team = get_current_user_and_team()
-    invoices = Invoice.query.filter_by(team_id=team.id).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'Number', 'Client', 'Status', 'Amount', 'Currency', 'Due Date', 'Created At'])
-    for inv in invoices:
-        client = Client.query.filter_by(id=inv.client_id, team_id=team.id).first()
-        writer.writerow([
-            inv.id, inv.number, client.name if client else '', inv.status, inv.amount, inv.currency,
-            inv.due_date.isoformat() if inv.due_date else '',
-            inv.created_at.isoformat() if inv.created_at else ''
-        ])
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
+    team_id = get_current_team_id()
+    query = invoice_csv_query(team_id, request.args)
+    return Response(
+        stream_with_context(iter_invoices_csv(query)),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name='invoices.csv'
+        headers={'Content-Disposition': 'attachment; filename=invoices.csv'}
     )
 
 @export_bp.route('/invoices/zip', methods=['GET'])
 def export_invoices_zip():
     user, team = get_current_user_and_team()
-    invoices = Invoice.query.filter_by(team_id=team.id).all()
-    
-    # Convert logo URL to file path if it exists
-    logo_path = None
-    if team.logo_url:
-        # Extract filename from URL like '/api/teams/logo/team_1_logo_filename.png'
-        filename = team.logo_url.split('/')[-1]
-        logo_path = os.path.join(os.path.dirname(__file__), '..', 'uploads', filename)
-        # Check if file actually exists
-        if not os.path.exists(logo_path):
-            logo_path = None
-    
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w') as zf:
-        for inv in invoices:
-            client = Client.query.filter_by(id=inv.client_id, team_id=team.id).first()
-            pdf_bytes = render_invoice_pdf(inv, client, team, logo_url=logo_path)
-            zf.writestr(f'invoice_{inv.number}.pdf', pdf_bytes)
-    zip_buffer.seek(0)
-    return send_file(
-        zip_buffer,
+    check_render_capacity()
+    logo_src = team_logo_src(team)
+    rows = db.session.execute(invoice_zip_query(team.id, request.args), execution_options={'yield_per': ZIP_BATCH_SIZE})
+    payloads = (invoice_pdf_payload(inv, client, team, logo_src, status) for inv, client, status in rows)
+    # Rendered in the process pool, written back in query order
+    entries = ((f'invoice_{payload["invoice"]["number"]}.pdf', pdf_bytes) for payload, pdf_bytes in render_pdfs(payloads))
+    return Response(
+        stream_with_context(iter_zip(entries)),
         mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=invoices.zip'}
+    )
+
+@export_bp.route('/invoices/pdf', methods=['GET'])
+def export_invoices_pdf():
+    user, team = get_current_user_and_team()
+    logo_src = team_logo_src(team)
+    started = time.perf_counter()
+    rows = db.session.execute(invoice_zip_query(team.id, request.args).limit(MAX_BATCH_PDF_INVOICES + 1)).all()
+    if len(rows) > MAX_BATCH_PDF_INVOICES:
+        abort(400, f'More than {MAX_BATCH_PDF_INVOICES} invoices match, narrow the filters or use the ZIP export')
+    if not rows:
+        abort(404, 'No invoices match the filters')
+    payloads = [invoice_pdf_payload(inv, client, team, logo_src, status) for inv, client, status in rows]
+    queried = time.perf_counter()
+    pdf_bytes = render_batch_pdf(payloads)
+    rendered = time.perf_counter()
+    render_ms = (rendered - queried) * 1000
+    return Response(pdf_bytes, mimetype='application/pdf', headers={
+        'Content-Disposition': 'attachment; filename=invoices.pdf',
+        'Server-Timing': f'db;dur={(queried - started) * 1000:.1f}, render;dur={render_ms:.1f}, '
+                         f'per-invoice;dur={render_ms / len(payloads):.1f}',
+        'X-Invoice-Count': str(len(payloads))
+    })
+
+def serialize_export_job(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'filters': job.params,
+        'total': job.total,
+        'processed': job.processed,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'download_url': url_for('export.download_export_job', job_id=job.id) if job.status == 'done' else None
+    }
+
+def _get_export_job(job_id):
+    job = ExportJob.query.filter_by(id=job_id, team_id=get_current_team_id()).first()
+    if not job:
+        abort(404, 'Export job not found')
+    return job
+
+@export_bp.route('/jobs', methods=['POST'])
+def create_export_job():
+    user, team = get_current_user_and_team()
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in EXPORT_KINDS:
+        abort(400, f'kind must be one of {", ".join(EXPORT_KINDS)}')
+    filters = data.get('filters') or {}
+    if not isinstance(filters, dict):
+        abort(400, 'filters must be an object')
+    job = enqueue_export_job(team.id, user.id, kind, filters)
+    response = jsonify(serialize_export_job(job))
+    response.status_code = 202
+    response.headers['Location'] = url_for('export.get_export_job', job_id=job.id)
+    return response
+
+@export_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_export_job(job_id):
+    return jsonify(serialize_export_job(_get_export_job(job_id)))
+
+@export_bp.route('/jobs/<int:job_id>/download', methods=['GET'])
+def download_export_job(job_id):
+    job = _get_export_job(job_id)
+    if job.status != 'done':
+        abort(409, f'Export is {job.status}')
+    if not job.artifact_path or not os.path.exists(job.artifact_path):
+        abort(410, 'Export file has expired')
+    return send_file(
+        job.artifact_path,
+        mimetype='text/csv' if job.kind == 'csv' else 'application/zip',
         as_attachment=True,
-        download_name='invoices.zip'
+        download_name=f'invoices.{job.kind}'
     )
 
-# Endpoints to be implemented 
\ No newline at end of file
+@export_bp.route('/pdf-cache/stats', methods=['GET'])
+def pdf_cache_stats():
+    if not PDF_CACHE_STATS_ENDPOINT:
+        abort(404)
+    # Hits and misses are counted per web worker process; bytes_on_disk is shared
+    return jsonify({**pdf_cache.stats(), 'pid': os.getpid()})
+
+@export_bp.cli.command('worker')
+@click.option('--interval', type=float, default=2.0, help='Seconds between polls when the queue is empty')
+@click.option('--once', is_flag=True, help='Exit once the queue is empty')
+def export_worker_command(interval, once):
+    """Run queued export jobs."""
+    run_export_worker(current_app._get_current_object(), interval, once)
+
+@export_bp.cli.command('purge-jobs')
+@click.option('--older-than-hours', type=float, default=24.0)
+def purge_jobs_command(older_than_hours):
+    """Delete finished export jobs and their files."""
+    count = purge_export_jobs(datetime.utcnow() - timedelta(hours=older_than_hours))
+    print(f'Purged {count} export jobs')
+
+@export_bp.cli.command('bench-pdf')
+@click.option('--team-id', type=int, required=True)
+@click.option('--limit', type=int, default=100, help='Number of invoices to render')
+def bench_pdf_command(team_id, limit):
+    """Compare per-invoice and single-document rendering for a team's invoices."""
+    team = db.session.get(Team, team_id)
+    if team is None:
+        raise click.ClickException(f'Team {team_id} not found')
+    logo_src = team_logo_src(team)
+    rows = db.session.execute(invoice_zip_query(team.id, {}).limit(limit)).all()
+    payloads = [invoice_pdf_payload(inv, client, team, logo_src, status) for inv, client, status in rows]
+    if not payloads:
+        raise click.ClickException('Team has no invoices')
+    started = time.perf_counter()
+    for payload in payloads:
+        render_invoice_pdf_payload(payload)
+    separate = time.perf_counter() - started
+    started = time.perf_counter()
+    render_invoices_pdf(payloads)
+    combined = time.perf_counter() - started
+    for label, seconds in (('per-invoice', separate), ('single-document', combined)):
+        print(f'{label}: {seconds:.2f}s, {seconds * 1000 / len(payloads):.1f} ms/invoice, '
+              f'{len(payloads) / seconds:.1f} invoices/s')
+
+# Endpoints to be implemented
\ No newline at end of file
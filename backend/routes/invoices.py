@@ -1,94 +1,95 @@
-from flask import Blueprint, request, jsonify, abort, send_file
-from backend.utils.firebase_auth import verify_firebase_token
+from flask import Blueprint, request, jsonify, abort, send_file, url_for
+from backend.utils.identity import get_current_user_and_team, get_current_team_id, require_user_and_team
 from backend.models.invoice import Invoice
 from backend.models.client import Client
-from backend.models.team import Team
-from backend.models.teammembership import TeamMembership
-from backend.models.user import User
 from backend.database import db
+from backend.utils.response_cache import cached_response
+from backend.utils.data_version import bump_data_version, etag_on_data_version
 from datetime import datetime
-from backend.utils.pdf import render_invoice_pdf
+from backend.utils.pdf import invoice_pdf_payload, team_logo_src
+from backend.utils.render_pool import render_pdf
+from backend.utils.pdf_warmer import schedule_pdf_warm
+from backend.utils.invoice_stats import apply_invoice_change, apply_invoice_changes, invoice_bucket
+from backend.utils.invoice_numbers import allocate_invoice_numbers
+from backend.utils.invoice_query import filter_invoices, paginate_invoices, estimate_count, effective_status, sweep_overdue_invoices, invoice_columns, iter_invoice_rows
+from backend.utils.serialization import columnar_response, gzip_negotiated, ndjson_response, response_format
+from sqlalchemy import update
+from concurrent.futures import TimeoutError as RenderTimeout
 import io
-import os
 
 invoices_bp = Blueprint('invoices', __name__)
+require_user_and_team(invoices_bp)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Columnar pages repeat no keys, so they can be much larger
+MAX_COLUMNAR_PAGE_SIZE = 20000
+INVOICE_FIELDS = ('id', 'number', 'client_id', 'status', 'amount', 'currency', 'due_date', 'created_at')
 
-def generate_invoice_number(team_id):
-    last_invoice = Invoice.query.filter_by(team_id=team_id).order_by(Invoice.id.desc()).first()
-    if last_invoice:
-        last_number = int(last_invoice.number)
-        return str(last_number + 1)
-    else:
-        return '1'
+def serialize_invoice(inv, status=None):
+    return {
+        'id': inv.id,
+        'number': inv.number,
+        'client_id': inv.client_id,
+        'status': status or inv.status,
+        'amount': inv.amount,
+        'currency': inv.currency,
+        'due_date': inv.due_date.isoformat() if inv.due_date else None,
+        'created_at': inv.created_at.isoformat() if inv.created_at else None
+    }
+
+MAX_BULK_INVOICES = 500
+
+def _invoice_for_update(team_id, invoice_id):
+    # Locked until commit, so the rollup's "before" bucket is the committed row
+    # and not one a concurrent sweep or edit has changed since. SQLite has no
+    # row locks; a no-op UPDATE takes its database write lock first instead.
+    if db.engine.dialect.name != 'postgresql':
+        db.session.execute(update(Invoice).where(Invoice.id == invoice_id).values(id=Invoice.id))
+    return Invoice.query.filter_by(id=invoice_id, team_id=team_id).with_for_update().populate_existing().first()
 
 @invoices_bp.route('/', methods=['GET'])
+@gzip_negotiated
+@etag_on_data_version
+@cached_response
 def list_invoices():
-    user, team = get_current_user_and_team()
-    status_filter = request.args.get('status')
-    now = datetime.utcnow().date()
-    invoices = Invoice.query.filter_by(team_id=team.id).all()
-    result = []
-    for inv in invoices:
-        # Auto-calculate overdue
-        if inv.status == 'unpaid' and inv.due_date and inv.due_date < now:
-            inv.status = 'overdue'
-            db.session.commit()
-        if status_filter and inv.status != status_filter:
-            continue
-        result.append({
-            'id': inv.id,
-            'number': inv.number,
-            'client_id': inv.client_id,
-            'status': inv.status,
-            'amount': inv.amount,
-            'currency': inv.currency,
-            'due_date': inv.due_date.isoformat() if inv.due_date else None,
-            'created_at': inv.created_at.isoformat() if inv.created_at else None
-        })
-    return jsonify(result)
+    team_id = get_current_team_id()
+    fmt = response_format()
+    query = filter_invoices(Invoice.query.filter(Invoice.team_id == team_id), request.args)
+    if fmt == 'ndjson':
+        # No page size: the whole result set streams row by row
+        response = ndjson_response(INVOICE_FIELDS, iter_invoice_rows(query, request.args.get('cursor')))
+        response.vary.add('Accept')
+        return response
+    max_limit = MAX_COLUMNAR_PAGE_SIZE if fmt == 'columnar' else MAX_PAGE_SIZE
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), max_limit))
+    if fmt == 'columnar':
+        rows, next_cursor = paginate_invoices(query, request.args.get('cursor'), limit, columns=invoice_columns())
+        response = columnar_response(INVOICE_FIELDS, rows)
+    else:
+        rows, next_cursor = paginate_invoices(query, request.args.get('cursor'), limit)
+        response = jsonify([serialize_invoice(inv, status) for inv, status in rows])
+    response.vary.add('Accept')
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(".list_invoices", **args)}>; rel="next"'
+    if request.args.get('include_total'):
+        response.headers['X-Total-Count'] = str(estimate_count(query))
+    return response
 
 @invoices_bp.route('/', methods=['POST'])
 def create_invoice():
-    user, team = get_current_user_and_team()
+    team_id = get_current_team_id()
     data = request.json
     client_id = data.get('client_id')
-    client = Client.query.filter_by(id=client_id, team_id=team.id).first()
+    client = Client.query.filter_by(id=client_id, team_id=team_id).first()
     if not client:
         abort(400, 'Client not found or not in your team')
-    number = generate_invoice_number(team.id)
+    number, = allocate_invoice_numbers(team_id)
     invoice = Invoice(
-        team_id=team.id,
+        team_id=team_id,
         client_id=client.id,
         number=number,
         status=data.get('status', 'unpaid'),
@@ -97,35 +98,66 @@ def create_invoice():
         due_date=datetime.fromisoformat(data['due_date']) if data.get('due_date') else None
     )
     db.session.add(invoice)
+    db.session.flush()
+    apply_invoice_change(None, invoice_bucket(invoice))
+    bump_data_version(team_id)
     db.session.commit()
+    schedule_pdf_warm([invoice.id])
     return jsonify({'id': invoice.id, 'number': invoice.number}), 201
 
+@invoices_bp.route('/bulk', methods=['POST'])
+def create_invoices_bulk():
+    team_id = get_current_team_id()
+    items = (request.json or {}).get('invoices') or []
+    if not items:
+        abort(400, 'invoices list required')
+    if len(items) > MAX_BULK_INVOICES:
+        abort(400, f'At most {MAX_BULK_INVOICES} invoices per request')
+    client_ids = {item.get('client_id') for item in items}
+    found = {c for (c,) in db.session.query(Client.id).filter(Client.team_id == team_id, Client.id.in_(client_ids))}
+    if found != client_ids:
+        abort(400, 'Client not found or not in your team')
+    numbers = allocate_invoice_numbers(team_id, len(items))
+    invoices = [Invoice(
+        team_id=team_id,
+        client_id=item['client_id'],
+        number=number,
+        status=item.get('status', 'unpaid'),
+        amount=item.get('amount'),
+        currency=item.get('currency', 'MAD'),
+        due_date=datetime.fromisoformat(item['due_date']) if item.get('due_date') else None
+    ) for item, number in zip(items, numbers)]
+    db.session.add_all(invoices)
+    db.session.flush()
+    apply_invoice_changes((None, invoice_bucket(invoice)) for invoice in invoices)
+    bump_data_version(team_id)
+    db.session.commit()
+    return jsonify([{'id': invoice.id, 'number': invoice.number} for invoice in invoices]), 201
+
 @invoices_bp.route('/<int:invoice_id>', methods=['GET'])
+@etag_on_data_version
+@cached_response
 def get_invoice(invoice_id):
-    user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
-    if not invoice:
+    team_id = get_current_team_id()
+    row = db.session.query(Invoice, effective_status()).filter(
+        Invoice.id == invoice_id,
+        Invoice.team_id == team_id
+    ).first()
+    if not row:
         abort(404, 'Invoice not found')
-    return jsonify({
-        'id': invoice.id,
-        'number': invoice.number,
-        'client_id': invoice.client_id,
-        'status': invoice.status,
-        'amount': invoice.amount,
-        'currency': invoice.currency,
-        'due_date': invoice.due_date.isoformat() if invoice.due_date else None,
-        'created_at': invoice.created_at.isoformat() if invoice.created_at else None
-    })
+    invoice, status = row
+    return jsonify(serialize_invoice(invoice, status))
 
 @invoices_bp.route('/<int:invoice_id>', methods=['PUT'])
 def update_invoice(invoice_id):
-    user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
+    team_id = get_current_team_id()
+    invoice = _invoice_for_update(team_id, invoice_id)
     if not invoice:
         abort(404, 'Invoice not found')
     data = request.json
+    before = invoice_bucket(invoice)
     if 'client_id' in data:
-        client = Client.query.filter_by(id=data['client_id'], team_id=team.id).first()
+        client = Client.query.filter_by(id=data['client_id'], team_id=team_id).first()
         if not client:
             abort(400, 'Client not found or not in your team')
         invoice.client_id = client.id
@@ -134,40 +166,43 @@ def update_invoice(invoice_id):
     invoice.currency = data.get('currency', invoice.currency)
     if 'due_date' in data:
         invoice.due_date = datetime.fromisoformat(data['due_date']) if data['due_date'] else None
+    apply_invoice_change(before, invoice_bucket(invoice))
+    bump_data_version(team_id)
     db.session.commit()
+    schedule_pdf_warm([invoice.id])
     return jsonify({'success': True})
 
 @invoices_bp.route('/<int:invoice_id>', methods=['DELETE'])
 def delete_invoice(invoice_id):
-    user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
+    team_id = get_current_team_id()
+    invoice = _invoice_for_update(team_id, invoice_id)
     if not invoice:
         abort(404, 'Invoice not found')
+    apply_invoice_change(invoice_bucket(invoice), None)
     db.session.delete(invoice)
+    bump_data_version(team_id)
     db.session.commit()
     return jsonify({'success': True})
 
 @invoices_bp.route('/<int:invoice_id>/pdf', methods=['GET'])
 def download_invoice_pdf(invoice_id):
     user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
-    if not invoice:
+    row = db.session.query(Invoice, effective_status()).filter(
+        Invoice.id == invoice_id,
+        Invoice.team_id == team.id
+    ).first()
+    if not row:
         abort(404, 'Invoice not found')
+    invoice, status = row
     client = Client.query.filter_by(id=invoice.client_id, team_id=team.id).first()
     if not client:
         abort(404, 'Client not found')
-    
-    # Convert logo URL to file path if it exists
-    logo_path = None
-    if team.logo_url:
-        # Extract filename from URL like '/api/teams/logo/team_1_logo_filename.png'
-        filename = team.logo_url.split('/')[-1]
-        logo_path = os.path.join(os.path.dirname(__file__), '..', 'uploads', filename)
-        # Check if file actually exists
-        if not os.path.exists(logo_path):
-            logo_path = None
-    
-    pdf_bytes = render_invoice_pdf(invoice, client, team, logo_url=logo_path)
+    # Served from the on-disk PDF cache unless something that affects the output changed;
+    # renders run in the renderer pool, never on this thread
+    try:
+        pdf_bytes = render_pdf(invoice_pdf_payload(invoice, client, team, team_logo_src(team), status))
+    except RenderTimeout:
+        abort(503, 'PDF is still being generated, try again shortly')
     return send_file(
         io.BytesIO(pdf_bytes),
         mimetype='application/pdf',
@@ -177,14 +212,24 @@ def download_invoice_pdf(invoice_id):
 
 @invoices_bp.route('/<int:invoice_id>/status', methods=['PATCH'])
 def update_invoice_status(invoice_id):
-    user, team = get_current_user_and_team()
-    invoice = Invoice.query.filter_by(id=invoice_id, team_id=team.id).first()
+    team_id = get_current_team_id()
+    invoice = _invoice_for_update(team_id, invoice_id)
     if not invoice:
         abort(404, 'Invoice not found')
     data = request.json
     status = data.get('status')
     if status not in ['paid', 'unpaid']:
         abort(400, 'Status must be "paid" or "unpaid"')
+    before = invoice_bucket(invoice)
     invoice.status = status
+    apply_invoice_change(before, invoice_bucket(invoice))
+    bump_data_version(team_id)
     db.session.commit()
-    return jsonify({'success': True, 'status': invoice.status}) 
\ No newline at end of file
+    schedule_pdf_warm([invoice.id])
+    return jsonify({'success': True, 'status': invoice.status})
+
+@invoices_bp.cli.command('sweep-overdue')
+def sweep_overdue_command():
+    """Mark every unpaid invoice past its due date as overdue."""
+    updated = sweep_overdue_invoices()
+    print(f'Marked {updated} invoice(s) overdue')
@@ -1,45 +1,25 @@
-from flask import Blueprint, request, jsonify, abort, send_from_directory
-from backend.utils.firebase_auth import verify_firebase_token
+from flask import Blueprint, Response, request, jsonify, abort, send_from_directory
+from backend.utils.identity import get_current_user_and_team, get_current_team_id, require_user_and_team, invalidate_identity
 from backend.models.team import Team
 from backend.models.teammembership import TeamMembership
 from backend.models.user import User
 from backend.database import db
+from backend.utils.logos import UPLOAD_FOLDER, process_logo
+from werkzeug.exceptions import HTTPException
 import os
+import re
 
 teams_bp = Blueprint('teams', __name__)
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+require_user_and_team(teams_bp, public_endpoints=('get_logo',))
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def get_current_user_and_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        # Always try to find by email, even if firebase_uid is different or empty
-        user_by_email = User.query.filter_by(email=user_info.get('email', '')).first()
-        if user_by_email:
-            user_by_email.firebase_uid = user_info['uid']
-            user_by_email.name = user_info.get('name', user_by_email.name)
-            db.session.commit()
-            user = user_by_email
-        else:
-            user = User(
-                firebase_uid=user_info['uid'],
-                email=user_info.get('email', ''),
-                name=user_info.get('name', '')
-            )
-            db.session.add(user)
-            db.session.commit()
-    membership = TeamMembership.query.filter_by(user_id=user.id).first()
-    if not membership:
-        # Auto-create a team for this user
-        team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
-        db.session.add(team)
-        db.session.commit()
-        membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
-        db.session.add(membership)
-        db.session.commit()
-        return user, team
-    return user, membership.team
+# Derivative names embed their content hash (see backend.utils.logos)
+HASHED_LOGO = re.compile(r'^logo_([0-9a-f]{20})_\d+\.png$')
+# Let the reverse proxy send logo bytes: 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd)
+LOGO_SENDFILE = os.getenv('LOGO_SENDFILE', '').lower()
+# nginx internal location that maps to the uploads folder
+LOGO_ACCEL_PREFIX = os.getenv('LOGO_ACCEL_PREFIX', '/protected-uploads/')
+LEGACY_LOGO_MAX_AGE = 300
 
 @teams_bp.route('/me', methods=['GET'])
 def get_team_info():
@@ -58,7 +38,7 @@ def get_team_info():
 
 @teams_bp.route('/invite', methods=['POST'])
 def invite_member():
-    user, team = get_current_user_and_team()
+    team_id = get_current_team_id()
     data = request.json
     email = data.get('email')
     if not email:
@@ -68,25 +48,28 @@ def invite_member():
         invitee = User(email=email, firebase_uid='', name='')
         db.session.add(invitee)
         db.session.commit()
-    if TeamMembership.query.filter_by(user_id=invitee.id, team_id=team.id).first():
+    if TeamMembership.query.filter_by(user_id=invitee.id, team_id=team_id).first():
         abort(400, 'User already a member')
-    membership = TeamMembership(user_id=invitee.id, team_id=team.id, role='member')
+    membership = TeamMembership(user_id=invitee.id, team_id=team_id, role='member')
     db.session.add(membership)
     db.session.commit()
+    invalidate_identity(invitee.firebase_uid)
     return jsonify({'success': True})
 
 @teams_bp.route('/remove', methods=['POST'])
 def remove_member():
-    user, team = get_current_user_and_team()
+    team_id = get_current_team_id()
     data = request.json
     user_id = data.get('user_id')
     if not user_id:
         abort(400, 'user_id required')
-    membership = TeamMembership.query.filter_by(user_id=user_id, team_id=team.id).first()
+    membership = TeamMembership.query.filter_by(user_id=user_id, team_id=team_id).first()
     if not membership:
         abort(404, 'Membership not found')
+    removed_uid = membership.user.firebase_uid
     db.session.delete(membership)
     db.session.commit()
+    invalidate_identity(removed_uid)
     return jsonify({'success': True})
 
 @teams_bp.route('/update', methods=['POST'])
@@ -103,24 +86,40 @@ def upload_logo():
     user, team = get_current_user_and_team()
     if 'logo' not in request.files:
         abort(400, 'No logo file uploaded')
-    file = request.files['logo']
-    filename = f'team_{team.id}_logo_{file.filename}'
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    team.logo_url = f'/api/teams/logo/{filename}'
+    # Decoded and resized once here; renders and page loads use the small derivatives
+    team.logo_pdf, team.logo_thumb = process_logo(request.files['logo'].stream)
+    team.logo_url = f'/api/teams/logo/{team.logo_thumb}'
     db.session.commit()
     return jsonify({'success': True, 'logo_url': team.logo_url})
 
 @teams_bp.route('/logo/<filename>', methods=['GET'])
 def get_logo(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    match = HASHED_LOGO.match(filename)
+    if not match:
+        # Pre-derivative upload: the name does not change with the content, so revalidate
+        return send_from_directory(UPLOAD_FOLDER, filename, max_age=LEGACY_LOGO_MAX_AGE)
+    etag = match.group(1)
+    if request.if_none_match.contains_weak(etag) or request.if_none_match.star_tag:
+        response = Response(status=304)
+    elif LOGO_SENDFILE == 'x-accel-redirect':
+        response = Response(mimetype='image/png')
+        response.headers['X-Accel-Redirect'] = LOGO_ACCEL_PREFIX + filename
+    elif LOGO_SENDFILE == 'x-sendfile':
+        response = Response(mimetype='image/png')
+        response.headers['X-Sendfile'] = os.path.abspath(os.path.join(UPLOAD_FOLDER, filename))
+    else:
+        response = send_from_directory(UPLOAD_FOLDER, filename, conditional=False, etag=False)
+    # Content-addressed URL: a new logo gets a new URL, so clients never need to revalidate
+    response.set_etag(etag)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
 
 @teams_bp.route('/list', methods=['GET'])
 def list_teams():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        abort(401, 'User not found')
+    user, team = get_current_user_and_team()
     memberships = TeamMembership.query.filter_by(user_id=user.id).all()
     teams = []
     for m in memberships:
@@ -130,10 +129,7 @@ def list_teams():
 
 @teams_bp.route('/switch', methods=['POST'])
 def switch_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        abort(401, 'User not found')
+    user, team = get_current_user_and_team()
     data = request.json
     team_id = data.get('team_id')
     membership = TeamMembership.query.filter_by(user_id=user.id, team_id=team_id).first()
@@ -142,14 +138,12 @@ def switch_team():
     # For demo: store active team in language_preference (should use session or dedicated field)
     user.language_preference = f'active_team:{team_id}'
     db.session.commit()
+    invalidate_identity(user.firebase_uid)
     return jsonify({'success': True, 'active_team_id': team_id})
 
 @teams_bp.route('/delete', methods=['POST'])
 def delete_team():
-    user_info = verify_firebase_token()
-    user = User.query.filter_by(firebase_uid=user_info['uid']).first()
-    if not user:
-        abort(401, 'User not found')
+    user, team = get_current_user_and_team()
     data = request.json
     team_id = data.get('team_id')
     team = Team.query.get(team_id)
@@ -157,11 +151,31 @@ def delete_team():
         abort(404, 'Team not found')
     if team.owner_id != user.id:
         abort(403, 'Only the team owner can delete the team')
+    member_uids = [uid for (uid,) in db.session.query(User.firebase_uid).join(
+        TeamMembership, TeamMembership.user_id == User.id
+    ).filter(TeamMembership.team_id == team.id)]
     # Delete memberships
     TeamMembership.query.filter_by(team_id=team.id).delete()
     # Delete the team
     db.session.delete(team)
     db.session.commit()
+    invalidate_identity(*member_uids)
     return jsonify({'success': True})
 
+@teams_bp.cli.command('process-logos')
+def process_logos_command():
+    """Create resized logo derivatives for teams that uploaded a logo before they existed."""
+    teams = Team.query.filter(Team.logo_url.isnot(None), Team.logo_pdf.is_(None)).all()
+    for team in teams:
+        path = os.path.join(UPLOAD_FOLDER, team.logo_url.split('/')[-1])
+        try:
+            with open(path, 'rb') as f:
+                team.logo_pdf, team.logo_thumb = process_logo(f)
+        except (OSError, HTTPException) as e:
+            print(f'Team {team.id}: skipped ({getattr(e, "description", e)})')
+            continue
+        team.logo_url = f'/api/teams/logo/{team.logo_thumb}'
+        print(f'Team {team.id}: {team.logo_pdf}, {team.logo_thumb}')
+    db.session.commit()
+
 # Endpoints to be implemented 
\ No newline at end of file
@@ -0,0 +1,20 @@
+from flask import Flask
+from backend.database import db
+import firebase_admin
+import pytest
+
+# backend.utils.identity initializes Firebase at import; without credentials
+# configured, start a default app whose credentials are only loaded on use
+if not firebase_admin._apps:
+    firebase_admin.initialize_app(options={'projectId': 'fatoora-tests'})
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        from backend.models import user, team, teammembership, client, invoice, teaminvoicestats, invoicecounter, exportjob
+        db.create_all()
+        yield app
+        db.session.remove()
@@ -0,0 +1,53 @@
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+from backend.models.invoice import Invoice
+from backend.database import db
+from backend.utils.invoice_query import encode_cursor, estimate_count, filter_invoices, paginate_invoices, sweep_overdue_invoices
+from datetime import datetime
+import pytest
+
+@pytest.fixture
+def statements(app):
+    # (sql, parameters) of every statement sent to the database
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield captured
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+def query_plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return ' | '.join(row[-1] for row in rows)
+
+def last_plan(statements, run):
+    statements.clear()
+    run()
+    return query_plan(*statements[-1])
+
+def listing(args):
+    return filter_invoices(Invoice.query.filter(Invoice.team_id == 1), MultiDict(args))
+
+def test_listing_uses_created_at_index(statements):
+    cursor = encode_cursor(Invoice(id=50, created_at=datetime(2026, 1, 1)))
+    for page_cursor in (None, cursor):
+        plan = last_plan(statements, lambda: paginate_invoices(listing({}), page_cursor, 100))
+        assert 'INDEX ix_invoices_team_id_created_at_id' in plan
+        assert 'TEMP B-TREE' not in plan
+
+def test_status_filter_uses_status_index(statements):
+    # The total only: SQLite keeps no per-value statistics, so a LIMIT page
+    # walks the created_at index whatever the status's selectivity
+    plan = last_plan(statements, lambda: estimate_count(listing({'status': 'paid'})))
+    assert 'INDEX ix_invoices_team_id_status_due_date' in plan
+
+def test_client_filter_uses_client_index(statements):
+    plan = last_plan(statements, lambda: paginate_invoices(listing({'client_id': '7'}), None, 100))
+    assert 'INDEX ix_invoices_team_id_client_id_created_at_id' in plan
+    assert 'TEMP B-TREE' not in plan
+
+def test_sweeper_uses_partial_unpaid_index(statements):
+    sweep_overdue_invoices()
+    statement, parameters = next(s for s in statements if s[0].startswith('UPDATE invoices'))
+    assert 'INDEX ix_invoices_unpaid_due_date' in query_plan(statement, parameters)
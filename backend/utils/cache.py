@@ -0,0 +1,101 @@
+from collections import OrderedDict
+import json
+import threading
+import time
+
+class LocalTTLCache:
+    # In-process LRU with a per-entry time-to-live. With max_bytes set, entries
+    # are also evicted once the sizes passed to set() add up past it.
+    def __init__(self, max_size=4096, ttl=300, max_bytes=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def set(self, key, value, ttl=None, size=0):
+        if self.max_size <= 0 or (self.max_bytes and size > self.max_bytes):
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_size or (self.max_bytes and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class RedisCache:
+    # Shared backend so invalidations reach every worker process.
+    # Values must be JSON serializable.
+    def __init__(self, url, prefix='fatoora:', ttl=300):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None, size=0):
+        # Size bounds are left to Redis's own maxmemory policy
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        return {'backend': 'redis'}
+
+def is_shared_cache_url(url):
+    return bool(url) and url.startswith(('redis://', 'rediss://', 'unix://'))
+
+def make_cache(url=None, prefix='fatoora:', max_size=4096, ttl=300, max_bytes=None):
+    if is_shared_cache_url(url):
+        return RedisCache(url, prefix=prefix, ttl=ttl)
+    return LocalTTLCache(max_size=max_size, ttl=ttl, max_bytes=max_bytes)
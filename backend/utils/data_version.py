@@ -0,0 +1,48 @@
+from flask import Response, g, make_response, request
+from sqlalchemy import select, update
+from backend.models.team import Team
+from backend.database import db
+from backend.utils.identity import get_current_team_id
+from backend.utils.serialization import negotiated_format
+from datetime import datetime
+from functools import wraps
+
+def bump_data_version(*team_ids):
+    # Call inside every client/invoice write's transaction, before commit
+    team_ids = {t for t in team_ids if t is not None}
+    if team_ids:
+        db.session.execute(
+            update(Team).where(Team.id.in_(team_ids)).values(data_version=Team.data_version + 1)
+        )
+
+def get_data_version(team_id):
+    return db.session.execute(select(Team.data_version).where(Team.id == team_id)).scalar() or 0
+
+def data_version_etag(team_id):
+    # Weak: equal versions mean semantically equal JSON, not identical bytes.
+    # The date is included because overdue status is derived from today's date,
+    # and the listing format because JSON, columnar and NDJSON bodies differ.
+    # Read once per request and shared with the response cache.
+    if 'data_version_etag' not in g:
+        version = get_data_version(team_id)
+        g.data_version_etag = f'{team_id}-{version}-{datetime.utcnow().date().isoformat()}-{negotiated_format()}'
+    return g.data_version_etag
+
+def etag_on_data_version(view):
+    # Conditional GET for team-scoped JSON: the version is read before the
+    # view runs, so a write racing the query only costs one extra full response
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = data_version_etag(get_current_team_id())
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.vary.add('Accept')
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
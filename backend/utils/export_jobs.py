@@ -0,0 +1,174 @@
+from sqlalchemy import and_, func, or_, select, update
+from werkzeug.datastructures import MultiDict
+from backend.models.exportjob import ExportJob
+from backend.models.team import Team
+from backend.database import db
+from backend.utils.exports import invoice_csv_query, invoice_zip_query, iter_invoices_csv, iter_zip
+from backend.utils.pdf import invoice_pdf_payload, team_logo_src
+from backend.utils.render_pool import render_pdfs
+from datetime import datetime, timedelta
+import logging
+import os
+import tempfile
+import threading
+import time
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'fatoora-exports'))
+# A running job whose heartbeat is older than this is assumed orphaned and re-queued
+EXPORT_JOB_STALE_SECONDS = int(os.getenv('EXPORT_JOB_STALE_SECONDS', '600'))
+EXPORT_JOB_MAX_ATTEMPTS = int(os.getenv('EXPORT_JOB_MAX_ATTEMPTS', '3'))
+EXPORT_KINDS = ('csv', 'zip')
+EXPORT_FILTERS = ('status', 'client_id', 'due_from', 'due_to', 'created_from', 'created_to', 'min_amount', 'max_amount')
+ZIP_BATCH_SIZE = 200
+PROGRESS_INTERVAL = 1.0
+
+def export_query(kind, team_id, args):
+    return invoice_csv_query(team_id, args).statement if kind == 'csv' else invoice_zip_query(team_id, args)
+
+def enqueue_export_job(team_id, user_id, kind, filters):
+    params = {k: str(filters[k]) for k in EXPORT_FILTERS if filters.get(k) not in (None, '')}
+    # Build the query now so bad filters fail with a 400 at submit time
+    export_query(kind, team_id, MultiDict(params))
+    job = ExportJob(team_id=team_id, user_id=user_id, kind=kind, params=params, status='queued', processed=0, attempts=0)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def _claimable(now):
+    return or_(
+        ExportJob.status == 'queued',
+        and_(ExportJob.status == 'running', ExportJob.heartbeat_at < now - timedelta(seconds=EXPORT_JOB_STALE_SECONDS))
+    )
+
+def claim_export_job():
+    # Oldest claimable job; SKIP LOCKED lets several workers poll the same table,
+    # and the conditional UPDATE makes the claim safe where row locks are unavailable
+    now = datetime.utcnow()
+    stmt = select(ExportJob.id).where(_claimable(now)).order_by(ExportJob.id).limit(1)
+    if db.engine.dialect.name == 'postgresql':
+        stmt = stmt.with_for_update(skip_locked=True)
+    job_id = db.session.execute(stmt).scalar()
+    if job_id is None:
+        db.session.rollback()
+        return None
+    claimed = db.session.execute(
+        update(ExportJob).where(ExportJob.id == job_id, _claimable(now)).values(
+            status='running', started_at=now, heartbeat_at=now, processed=0, error=None,
+            attempts=ExportJob.attempts + 1
+        )
+    ).rowcount
+    db.session.commit()
+    return db.session.get(ExportJob, job_id) if claimed else None
+
+def _report_progress(job_id, processed):
+    # Own short transaction: the job's session is busy streaming the export query
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(update(ExportJob).where(ExportJob.id == job_id).values(
+                processed=processed, heartbeat_at=datetime.utcnow()
+            ))
+    except Exception:
+        logging.warning('Could not record progress for export job %s', job_id, exc_info=True)
+
+def _progress_reporter(job_id):
+    last = [0.0]
+
+    def report(processed):
+        now = time.monotonic()
+        if now - last[0] >= PROGRESS_INTERVAL:
+            last[0] = now
+            _report_progress(job_id, processed)
+    return report
+
+def _export_chunks(job, team, args, report):
+    if job.kind == 'csv':
+        return iter_invoices_csv(invoice_csv_query(team.id, args), on_progress=report)
+    logo_src = team_logo_src(team)
+    rows = db.session.execute(invoice_zip_query(team.id, args), execution_options={'yield_per': ZIP_BATCH_SIZE})
+    payloads = (invoice_pdf_payload(inv, client, team, logo_src, status) for inv, client, status in rows)
+
+    def entries():
+        for i, (payload, pdf_bytes) in enumerate(render_pdfs(payloads), 1):
+            yield f'invoice_{payload["invoice"]["number"]}.pdf', pdf_bytes
+            report(i)
+    return iter_zip(entries())
+
+def run_export_job(job):
+    args = MultiDict(job.params or {})
+    team = db.session.get(Team, job.team_id)
+    stmt = export_query(job.kind, job.team_id, args)
+    job.total = db.session.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar()
+    db.session.commit()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f'export_{job.id}.{job.kind}')
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in _export_chunks(job, team, args, _progress_reporter(job.id)):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    job.status = 'done'
+    job.processed = job.total
+    job.artifact_path = path
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def run_next_export_job():
+    # Returns False when the queue is empty
+    job = claim_export_job()
+    if job is None:
+        return False
+    if job.attempts > EXPORT_JOB_MAX_ATTEMPTS:
+        job.status = 'failed'
+        job.error = 'Export worker stopped repeatedly while running this job'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    try:
+        run_export_job(job)
+    except Exception as e:
+        logging.exception('Export job %s failed', job.id)
+        db.session.rollback()
+        job = db.session.get(ExportJob, job.id)
+        job.status = 'failed'
+        job.error = str(e) or e.__class__.__name__
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return True
+
+def run_export_worker(app, interval, once=False):
+    # Drain the queue, then poll every `interval` seconds (or return if `once`)
+    while True:
+        with app.app_context():
+            try:
+                ran = run_next_export_job()
+            except Exception:
+                logging.exception('Export worker iteration failed')
+                db.session.rollback()
+                ran = False
+        if not ran:
+            if once:
+                return
+            time.sleep(interval)
+
+def start_export_worker(app, interval):
+    # In-process alternative to `flask export worker`
+    thread = threading.Thread(target=run_export_worker, args=(app, interval), name='export-worker', daemon=True)
+    thread.start()
+    return thread
+
+def purge_export_jobs(older_than):
+    # Delete finished jobs created before `older_than` along with their artifacts
+    jobs = ExportJob.query.filter(
+        ExportJob.status.in_(('done', 'failed')),
+        ExportJob.created_at < older_than
+    ).all()
+    for job in jobs:
+        if job.artifact_path and os.path.exists(job.artifact_path):
+            os.remove(job.artifact_path)
+        db.session.delete(job)
+    db.session.commit()
+    return len(jobs)
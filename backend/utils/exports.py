@@ -0,0 +1,83 @@
+from sqlalchemy import and_, select
+from backend.models.invoice import Invoice
+from backend.models.client import Client
+from backend.database import db
+from backend.utils.invoice_query import effective_status, filter_invoices
+import io
+import csv
+import zipfile
+
+CSV_HEADER = ['ID', 'Number', 'Client', 'Status', 'Amount', 'Currency', 'Due Date', 'Created At']
+CSV_BATCH_SIZE = 1000
+
+def invoice_csv_query(team_id, args):
+    # Built eagerly so bad filters fail with a 400 before any byte is streamed
+    query = db.session.query(
+        Invoice.id,
+        Invoice.number,
+        Client.name,
+        effective_status(),
+        Invoice.amount,
+        Invoice.currency,
+        Invoice.due_date,
+        Invoice.created_at
+    ).outerjoin(
+        Client, and_(Client.id == Invoice.client_id, Client.team_id == team_id)
+    ).filter(Invoice.team_id == team_id)
+    return filter_invoices(query, args).order_by(Invoice.created_at, Invoice.id)
+
+def invoice_zip_query(team_id, args):
+    # (Invoice, Client, effective status) rows for the PDF exports
+    stmt = select(Invoice, Client, effective_status()).outerjoin(
+        Client, and_(Client.id == Invoice.client_id, Client.team_id == team_id)
+    ).filter(Invoice.team_id == team_id)
+    return filter_invoices(stmt, args).order_by(Invoice.created_at, Invoice.id)
+
+def iter_invoices_csv(query, batch_size=CSV_BATCH_SIZE, on_progress=None):
+    # Server-side cursor in batches; each batch is encoded and yielded as one chunk.
+    # on_progress(rows_written) is called after every batch.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    rows = query.execution_options(yield_per=batch_size)
+    for i, (inv_id, number, client_name, status, amount, currency, due_date, created_at) in enumerate(rows, 1):
+        writer.writerow([
+            inv_id, number, client_name or '', status, amount, currency,
+            due_date.isoformat() if due_date else '',
+            created_at.isoformat() if created_at else ''
+        ])
+        if i % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            if on_progress:
+                on_progress(i)
+    yield buffer.getvalue().encode()
+
+class _ZipSink:
+    # Write-only, non-seekable target: zipfile falls back to data descriptors
+    # and the archive can be drained entry by entry.
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_zip(entries):
+    # entries: iterable of (name, bytes). PDFs are already compressed, so
+    # they are stored as-is; memory holds one entry at a time.
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
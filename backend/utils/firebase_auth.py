@@ -1,6 +1,10 @@
 import firebase_admin
 from firebase_admin import auth, credentials
 from flask import request, abort
+from collections import OrderedDict
+import hashlib
+import threading
+import time
 import os
 import logging
 
@@ -9,17 +13,78 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(os.getenv('FIREBASE_ADMIN_CREDENTIALS'))
     firebase_admin.initialize_app(cred)
 
+class VerifiedTokenCache:
+    # Maps sha256(id_token) -> decoded claims until the token's own `exp`,
+    # so repeated requests with the same bearer token skip signature checks.
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode()).hexdigest()
+
+    def get(self, id_token):
+        key = self._key(id_token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, id_token, decoded_token):
+        expires_at = decoded_token.get('exp')
+        if not expires_at or expires_at <= time.time() or self.max_size <= 0:
+            return
+        key = self._key(id_token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(decoded_token))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+token_cache = VerifiedTokenCache(max_size=int(os.getenv('FIREBASE_TOKEN_CACHE_SIZE', '1024')))
+
 def verify_firebase_token():
     auth_header = request.headers.get('Authorization', None)
-    logging.warning(f"Authorization header: {auth_header}")
     if not auth_header or not auth_header.startswith('Bearer '):
         logging.error("Missing or invalid Authorization header")
         abort(401, 'Missing or invalid Authorization header')
     id_token = auth_header.split(' ')[1]
+    decoded_token = token_cache.get(id_token)
+    if decoded_token is not None:
+        return decoded_token
     try:
         decoded_token = auth.verify_id_token(id_token)
-        logging.warning(f"Decoded Firebase token: {decoded_token}")
-        return decoded_token
+        logging.debug(f"Decoded Firebase token for uid {decoded_token.get('uid')}")
     except Exception as e:
         logging.error(f"Invalid Firebase token: {str(e)}")
-        abort(401, f'Invalid Firebase token: {str(e)}') 
\ No newline at end of file
+        abort(401, f'Invalid Firebase token: {str(e)}')
+    token_cache.set(id_token, decoded_token)
+    return decoded_token
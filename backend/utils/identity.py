@@ -0,0 +1,125 @@
+from flask import g, request
+from backend.utils.firebase_auth import verify_firebase_token
+from backend.utils.cache import is_shared_cache_url, make_cache
+from backend.models.team import Team
+from backend.models.teammembership import TeamMembership
+from backend.models.user import User
+from backend.database import db
+import os
+
+IDENTITY_CACHE_URL = os.getenv('IDENTITY_CACHE_URL')
+# Without a shared backend, invalidate_identity() only clears the worker
+# process that handled the membership change. Other workers keep the old
+# identity (a removed member keeps team access) until it expires, so the
+# in-process default TTL is kept short. Set IDENTITY_CACHE_URL to a Redis
+# URL when running several workers.
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '60' if is_shared_cache_url(IDENTITY_CACHE_URL) else '5'))
+
+# firebase_uid -> {'user_id', 'team_id', 'role'}, shared across requests
+identity_cache = make_cache(
+    IDENTITY_CACHE_URL,
+    prefix='fatoora:identity:',
+    max_size=int(os.getenv('IDENTITY_CACHE_SIZE', '4096')),
+    ttl=IDENTITY_CACHE_TTL
+)
+
+def invalidate_identity(*firebase_uids):
+    for uid in firebase_uids:
+        if uid:
+            identity_cache.delete(uid)
+
+def _get_or_create_user(user_info):
+    # Always try to find by email, even if firebase_uid is different or empty
+    user = User.query.filter_by(email=user_info.get('email', '')).first()
+    if user:
+        user.firebase_uid = user_info['uid']
+        user.name = user_info.get('name', user.name)
+    else:
+        user = User(
+            firebase_uid=user_info['uid'],
+            email=user_info.get('email', ''),
+            name=user_info.get('name', '')
+        )
+        db.session.add(user)
+    db.session.commit()
+    return user
+
+def _create_personal_team(user):
+    team = Team(name=f"{user.name or user.email}'s Team", owner_id=user.id)
+    db.session.add(team)
+    db.session.flush()
+    membership = TeamMembership(user_id=user.id, team_id=team.id, role='owner')
+    db.session.add(membership)
+    db.session.commit()
+    return membership, team
+
+def _query_user_and_team(firebase_uid):
+    # User, first membership and its team in one round trip
+    return db.session.query(User, TeamMembership, Team).outerjoin(
+        TeamMembership, TeamMembership.user_id == User.id
+    ).outerjoin(
+        Team, Team.id == TeamMembership.team_id
+    ).filter(
+        User.firebase_uid == firebase_uid
+    ).order_by(TeamMembership.id).first()
+
+def resolve_user_and_team(user_info):
+    row = _query_user_and_team(user_info['uid'])
+    if not row:
+        _get_or_create_user(user_info)
+        row = _query_user_and_team(user_info['uid'])
+    user, membership, team = row
+    if not membership or not team:
+        # Auto-create a team for this user
+        membership, team = _create_personal_team(user)
+    return user, membership, team
+
+def _set_identity(identity):
+    g.current_user_id = identity['user_id']
+    g.current_team_id = identity['team_id']
+    g.current_role = identity['role']
+
+def _resolve_identity(user_info):
+    user, membership, team = resolve_user_and_team(user_info)
+    identity = {'user_id': user.id, 'team_id': team.id, 'role': membership.role}
+    identity_cache.set(user_info['uid'], identity)
+    _set_identity(identity)
+    g.current_user = user
+    g.current_team = team
+
+def load_current_user_and_team():
+    if 'current_team_id' in g:
+        return
+    user_info = verify_firebase_token()
+    identity = identity_cache.get(user_info['uid'])
+    if identity is None:
+        _resolve_identity(user_info)
+    else:
+        _set_identity(identity)
+
+def get_current_team_id():
+    load_current_user_and_team()
+    return g.current_team_id
+
+def get_current_user_and_team():
+    load_current_user_and_team()
+    if 'current_user' not in g or 'current_team' not in g:
+        user = db.session.get(User, g.current_user_id)
+        team = db.session.get(Team, g.current_team_id)
+        if user and team:
+            g.current_user = user
+            g.current_team = team
+        else:
+            # Stale cache entry: the user or team was deleted by another worker
+            user_info = verify_firebase_token()
+            identity_cache.delete(user_info['uid'])
+            _resolve_identity(user_info)
+    return g.current_user, g.current_team
+
+def require_user_and_team(blueprint, public_endpoints=()):
+    # Resolve identity once per request for every view of the blueprint
+    @blueprint.before_request
+    def _load_identity():
+        if request.endpoint and request.endpoint.rsplit('.', 1)[-1] in public_endpoints:
+            return
+        load_current_user_and_team()
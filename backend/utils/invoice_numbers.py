@@ -0,0 +1,31 @@
+from sqlalchemy import Integer, cast, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.models.invoice import Invoice
+from backend.models.invoicecounter import InvoiceCounter
+from backend.database import db
+
+def _bump(team_id, count):
+    return db.session.execute(
+        update(InvoiceCounter).where(
+            InvoiceCounter.team_id == team_id
+        ).values(
+            last_number=InvoiceCounter.last_number + count
+        ).returning(InvoiceCounter.last_number)
+    ).scalar()
+
+def allocate_invoice_numbers(team_id, count=1):
+    # Reserve `count` consecutive numbers in one statement. The counter row
+    # stays locked until the caller's transaction ends, so concurrent
+    # creations in the same team queue here instead of colliding.
+    last = _bump(team_id, count)
+    if last is None:
+        # First allocation for this team: seed the counter from existing invoices
+        seed = db.session.query(func.max(cast(Invoice.number, Integer))).filter(
+            Invoice.team_id == team_id
+        ).scalar() or 0
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        db.session.execute(
+            dialect.insert(InvoiceCounter).values(team_id=team_id, last_number=seed).on_conflict_do_nothing()
+        )
+        last = _bump(team_id, count)
+    return [str(n) for n in range(last - count + 1, last + 1)]
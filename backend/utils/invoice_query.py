@@ -0,0 +1,158 @@
+from flask import abort
+from sqlalchemy import and_, case, func, or_, select, text, tuple_, update
+from backend.models.invoice import Invoice
+from backend.database import db
+from backend.utils.invoice_stats import apply_status_sweep
+from backend.utils.data_version import bump_data_version
+from datetime import datetime, date
+import base64
+import json
+import logging
+import threading
+import time
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'Invalid {name}, expected YYYY-MM-DD')
+
+def _parse_datetime(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, f'Invalid {name}, expected an ISO 8601 date or datetime')
+
+def _parse_float(value, name):
+    try:
+        return float(value)
+    except ValueError:
+        abort(400, f'Invalid {name}, expected a number')
+
+def effective_status(today=None):
+    # Unpaid invoices past their due date read as overdue without a write
+    today = today or datetime.utcnow().date()
+    return case(
+        (and_(Invoice.status == 'unpaid', Invoice.due_date < today), 'overdue'),
+        else_=Invoice.status
+    )
+
+def status_filter(statuses, today=None):
+    # Sargable equivalent of effective_status().in_(statuses)
+    today = today or datetime.utcnow().date()
+    clauses = []
+    for status in statuses:
+        if status == 'overdue':
+            clauses.append(Invoice.status == 'overdue')
+            clauses.append(and_(Invoice.status == 'unpaid', Invoice.due_date < today))
+        elif status == 'unpaid':
+            clauses.append(and_(Invoice.status == 'unpaid', or_(Invoice.due_date.is_(None), Invoice.due_date >= today)))
+        else:
+            clauses.append(Invoice.status == status)
+    return or_(*clauses)
+
+def filter_invoices(query, args):
+    # Shared listing/export filters; ranges are half-open [from, to)
+    if args.get('status'):
+        statuses = [s for s in args['status'].split(',') if s]
+        query = query.filter(status_filter(statuses))
+    if args.get('client_id'):
+        client_id = args.get('client_id', type=int)
+        if client_id is None:
+            abort(400, 'Invalid client_id')
+        query = query.filter(Invoice.client_id == client_id)
+    if args.get('due_from'):
+        query = query.filter(Invoice.due_date >= _parse_date(args['due_from'], 'due_from'))
+    if args.get('due_to'):
+        query = query.filter(Invoice.due_date < _parse_date(args['due_to'], 'due_to'))
+    if args.get('created_from'):
+        query = query.filter(Invoice.created_at >= _parse_datetime(args['created_from'], 'created_from'))
+    if args.get('created_to'):
+        query = query.filter(Invoice.created_at < _parse_datetime(args['created_to'], 'created_to'))
+    if args.get('min_amount'):
+        query = query.filter(Invoice.amount >= _parse_float(args['min_amount'], 'min_amount'))
+    if args.get('max_amount'):
+        query = query.filter(Invoice.amount <= _parse_float(args['max_amount'], 'max_amount'))
+    return query
+
+def encode_cursor(invoice):
+    raw = json.dumps([invoice.created_at.isoformat(), invoice.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, invoice_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(invoice_id)
+    except (ValueError, TypeError):
+        abort(400, 'Invalid cursor')
+
+def invoice_columns(today=None):
+    # Plain-column listing rows, in the order of INVOICE_FIELDS in routes/invoices.py
+    return (
+        Invoice.id, Invoice.number, Invoice.client_id, effective_status(today).label('status'),
+        Invoice.amount, Invoice.currency, Invoice.due_date, Invoice.created_at
+    )
+
+def _after_cursor(query, cursor):
+    if cursor:
+        query = query.filter(tuple_(Invoice.created_at, Invoice.id) < tuple_(*decode_cursor(cursor)))
+    return query.order_by(Invoice.created_at.desc(), Invoice.id.desc())
+
+def paginate_invoices(query, cursor=None, limit=100, columns=None):
+    # Keyset pagination, newest first, on (created_at, id).
+    # Returns (invoice, effective_status) pairs, or plain rows of `columns`.
+    query = query.with_entities(*columns) if columns else query.add_columns(effective_status())
+    rows = _after_cursor(query, cursor).limit(limit + 1).all()
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last if columns else last[0])
+    else:
+        next_cursor = None
+    return [tuple(row) for row in rows[:limit]], next_cursor
+
+def iter_invoice_rows(query, cursor=None, batch_size=1000):
+    # Every matching row from `cursor` on, read through a server-side cursor
+    return _after_cursor(query.with_entities(*invoice_columns()), cursor).execution_options(yield_per=batch_size)
+
+def estimate_count(query):
+    # Planner row estimate on PostgreSQL, exact count elsewhere
+    stmt = query.with_entities(Invoice.id).order_by(None).statement
+    if db.engine.dialect.name == 'postgresql':
+        compiled = stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    return db.session.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+
+def sweep_overdue_invoices(today=None):
+    # One set-based UPDATE persisting what effective_status() derives on read
+    today = today or datetime.utcnow().date()
+    swept = db.session.execute(
+        update(Invoice).where(
+            Invoice.status == 'unpaid',
+            Invoice.due_date < today
+        ).values(status='overdue').returning(
+            Invoice.team_id, Invoice.currency, Invoice.created_at, Invoice.amount
+        )
+    ).all()
+    apply_status_sweep(swept, 'unpaid', 'overdue')
+    bump_data_version(*{team_id for team_id, _, _, _ in swept})
+    db.session.commit()
+    return len(swept)
+
+def start_overdue_sweeper(app, interval):
+    # Periodic in-process alternative to `flask invoices sweep-overdue`
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    sweep_overdue_invoices()
+                except Exception:
+                    logging.exception('Overdue sweep failed')
+                    db.session.rollback()
+            time.sleep(interval)
+    thread = threading.Thread(target=run, name='overdue-sweeper', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,146 @@
+from sqlalchemy import Date, Integer, cast, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from backend.models.invoice import Invoice
+from backend.models.teaminvoicestats import TeamInvoiceStats
+from backend.models.team import Team
+from backend.database import db
+from backend.utils.data_version import bump_data_version
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+def date_bucket(granularity, column):
+    # Start date of the day/week (Monday)/month/quarter containing `column`
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.date_trunc(granularity, column), Date)
+    if granularity == 'day':
+        return func.date(column)
+    if granularity == 'week':
+        return func.date(column, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return func.date(column, 'start of month')
+    months_into_quarter = (cast(func.strftime('%m', column), Integer) - 1) % 3
+    return func.date(column, 'start of month', func.printf('-%d months', months_into_quarter))
+
+def bucket_starts(granularity, start, end):
+    # Every bucket start in [start, end), matching date_bucket()
+    if granularity == 'day':
+        current, step = start, lambda d: d + timedelta(days=1)
+    elif granularity == 'week':
+        current, step = start - timedelta(days=start.weekday()), lambda d: d + timedelta(days=7)
+    else:
+        months = 1 if granularity == 'month' else 3
+        current = date(start.year, start.month - (start.month - 1) % months, 1)
+
+        def step(d):
+            month = d.month - 1 + months
+            return date(d.year + month // 12, month % 12 + 1, 1)
+    while current < end:
+        yield current
+        current = step(current)
+
+def month_start(column):
+    return date_bucket('month', column)
+
+def _cents(amount):
+    # Exact deltas: float increments would drift forever in the running totals
+    return Decimal(str(amount or 0)).quantize(Decimal('0.01'))
+
+def invoice_bucket(invoice):
+    # (team_id, currency, status, month) -> (count, amount) contribution of one invoice
+    created_at = invoice.created_at or datetime.utcnow()
+    key = (invoice.team_id, invoice.currency or 'MAD', invoice.status or 'unpaid', date(created_at.year, created_at.month, 1))
+    return key, _cents(invoice.amount)
+
+def _upsert(deltas):
+    rows = [
+        {'team_id': k[0], 'currency': k[1], 'status': k[2], 'month': k[3], 'invoice_count': count, 'total_amount': amount}
+        for k, (count, amount) in sorted(deltas.items()) if count or amount
+    ]
+    if not rows:
+        return
+    # Atomic increments; keys are sorted so concurrent writers lock rows in the same order
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(TeamInvoiceStats).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['team_id', 'currency', 'status', 'month'],
+        set_={
+            'invoice_count': TeamInvoiceStats.invoice_count + stmt.excluded.invoice_count,
+            'total_amount': TeamInvoiceStats.total_amount + stmt.excluded.total_amount
+        }
+    )
+    db.session.execute(stmt)
+    # Drop rows whose invoices all moved away, so the rollup only holds live buckets
+    db.session.execute(delete(TeamInvoiceStats).where(
+        TeamInvoiceStats.team_id.in_({row['team_id'] for row in rows}),
+        TeamInvoiceStats.invoice_count == 0
+    ))
+
+def apply_invoice_changes(changes):
+    # Call inside the invoice write's transaction with (before, after)
+    # invoice_bucket() snapshots; None for a side that does not exist
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for before, after in changes:
+        if before:
+            key, amount = before
+            deltas[key][0] -= 1
+            deltas[key][1] -= amount
+        if after:
+            key, amount = after
+            deltas[key][0] += 1
+            deltas[key][1] += amount
+    _upsert(deltas)
+
+def apply_invoice_change(before, after):
+    apply_invoice_changes([(before, after)])
+
+def apply_status_sweep(swept_rows, from_status, to_status):
+    # swept_rows: (team_id, currency, created_at, amount) returned by a bulk UPDATE
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for team_id, currency, created_at, amount in swept_rows:
+        created_at = created_at or datetime.utcnow()
+        month = date(created_at.year, created_at.month, 1)
+        amount = _cents(amount)
+        for status, sign in ((from_status, -1), (to_status, 1)):
+            key = (team_id, currency or 'MAD', status, month)
+            deltas[key][0] += sign
+            deltas[key][1] += sign * amount
+    _upsert(deltas)
+
+def rebuild_invoice_stats(team_id=None):
+    # Recompute the rollup from scratch, for one team or all of them
+    clear = TeamInvoiceStats.__table__.delete()
+    source = select(
+        Invoice.team_id,
+        func.coalesce(Invoice.currency, 'MAD'),
+        func.coalesce(Invoice.status, 'unpaid'),
+        month_start(Invoice.created_at),
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.amount), 0)
+    ).where(Invoice.team_id.isnot(None), Invoice.created_at.isnot(None))
+    if team_id is not None:
+        clear = clear.where(TeamInvoiceStats.team_id == team_id)
+        source = source.where(Invoice.team_id == team_id)
+    source = source.group_by(*source.selected_columns[:4])
+    db.session.execute(clear)
+    db.session.execute(insert(TeamInvoiceStats).from_select(
+        ['team_id', 'currency', 'status', 'month', 'invoice_count', 'total_amount'], source
+    ))
+    # Totals changed without an invoice write: drop cached responses and ETags
+    bump_data_version(*([team_id] if team_id is not None else db.session.scalars(select(Team.id))))
+    db.session.commit()
+
+def ensure_invoice_stats():
+    # Fill the rollup when its table is empty but invoices exist, as when
+    # db.create_all() has just created it on an existing database
+    if db.session.query(TeamInvoiceStats.team_id).first() or not db.session.query(Invoice.id).first():
+        db.session.rollback()
+        return
+    try:
+        rebuild_invoice_stats()
+    except IntegrityError:
+        # Another worker starting up filled it first
+        db.session.rollback()
@@ -0,0 +1,61 @@
+from flask import abort
+from PIL import Image, ImageOps, UnidentifiedImageError
+from functools import lru_cache
+import base64
+import hashlib
+import io
+import os
+import tempfile
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+# Bounding boxes in pixels: the PDF shows the logo at 40px (4x for print),
+# the web UI at 64px (2x for high-DPI screens)
+LOGO_PDF_SIZE = 160
+LOGO_THUMB_SIZE = 128
+# Refuse decompression bombs before decoding
+MAX_LOGO_PIXELS = 40_000_000
+
+def _derivative(image, size):
+    copy = image.copy()
+    copy.thumbnail((size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    copy.save(out, format='PNG', optimize=True)
+    data = out.getvalue()
+    # Content-addressed name: identical logos share a file and never go stale
+    return f'logo_{hashlib.sha256(data).hexdigest()[:20]}_{size}.png', data
+
+def _save(filename, data):
+    path = os.path.join(UPLOAD_FOLDER, filename)
+    if os.path.exists(path):
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    # mkstemp creates 0600; the web server may serve the file as another user
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+def process_logo(stream):
+    # Decode the upload once and write the PDF and web derivatives.
+    # Returns (pdf_filename, thumb_filename) relative to UPLOAD_FOLDER.
+    try:
+        image = Image.open(stream, formats=['PNG', 'JPEG', 'GIF', 'WEBP'])
+        if image.width * image.height > MAX_LOGO_PIXELS:
+            abort(400, 'Logo image is too large')
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        abort(400, 'Logo must be a PNG, JPEG, GIF or WebP image')
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    names = []
+    for size in (LOGO_PDF_SIZE, LOGO_THUMB_SIZE):
+        filename, data = _derivative(image, size)
+        _save(filename, data)
+        names.append(filename)
+    return tuple(names)
+
+@lru_cache(maxsize=256)
+def logo_data_uri(filename):
+    # Filenames are content hashes, so the cached value is valid forever
+    with open(os.path.join(UPLOAD_FOLDER, filename), 'rb') as f:
+        return 'data:image/png;base64,' + base64.b64encode(f.read()).decode()
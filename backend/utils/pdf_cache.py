@@ -0,0 +1,169 @@
+from backend.utils.pdf import TEMPLATE_VERSION, render_invoice_pdf_payload
+from concurrent.futures import CancelledError, Future
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'fatoora-pdf-cache'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# Seconds a request waits on another request's in-flight render of the same PDF
+PDF_RENDER_WAIT_TIMEOUT = float(os.getenv('PDF_RENDER_WAIT_TIMEOUT', '60'))
+
+class PdfCache:
+    # Content-addressed PDF store on local disk. Files are written atomically
+    # (temp file + rename) and evicted least-recently-used once the directory
+    # grows past max_bytes; a hit refreshes the file's mtime.
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(payload):
+        material = {
+            'template': TEMPLATE_VERSION,
+            'invoice': payload['invoice'],
+            'client': payload['client'],
+            'team': payload['team'],
+            # A content-addressed data URI; legacy file:// logos are keyed by path
+            'logo': payload['logo_url']
+        }
+        return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pdf')
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _disk_bytes(self):
+        if self._bytes is None:
+            self._bytes = sum(size for _, size, _ in self._scan())
+        return self._bytes
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def contains(self, key):
+        # Presence check that does not count as a lookup
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._bytes = self._disk_bytes() + len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop oldest files until the cache is back under 90% of its budget
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'bytes_on_disk': self._disk_bytes(),
+                'max_bytes': self.max_bytes
+            }
+
+pdf_cache = PdfCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES)
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _forget(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+def render_once(key, start):
+    # Single flight per cache key: while a render is running, every caller gets
+    # that render's future. start() begins a render and returns a future for
+    # bytes that are in the cache by the time it resolves. Returns
+    # (future, started_here).
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = start()
+        _inflight[key] = future
+    future.add_done_callback(lambda f: _forget(key, f))
+    return future, True
+
+def get_or_render_pdf(payload, timeout=PDF_RENDER_WAIT_TIMEOUT, lookup=True):
+    # Raises concurrent.futures.TimeoutError if another request's render of the
+    # same PDF takes longer than `timeout`; a failed render raises in every waiter.
+    # lookup=False skips the first cache read when the caller already missed.
+    key = pdf_cache.key(payload)
+    while True:
+        pdf_bytes = pdf_cache.get(key) if lookup else None
+        if pdf_bytes is not None:
+            return pdf_bytes
+        lookup = True
+        future, leader = render_once(key, Future)
+        if not leader:
+            try:
+                return future.result(timeout=timeout)
+            except CancelledError:
+                # The batch that owned the render went away; render it ourselves
+                continue
+        try:
+            pdf_bytes = render_invoice_pdf_payload(payload)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        pdf_cache.put(key, pdf_bytes)
+        future.set_result(pdf_bytes)
+        return pdf_bytes
@@ -0,0 +1,78 @@
+from flask import current_app
+from backend.models.invoice import Invoice
+from backend.models.client import Client
+from backend.models.team import Team
+from backend.database import db
+from backend.utils.invoice_query import effective_status
+from backend.utils.pdf import invoice_pdf_payload, team_logo_src
+from backend.utils.pdf_cache import pdf_cache
+from backend.utils.render_pool import render_pdfs
+from sqlalchemy import and_
+import logging
+import os
+import threading
+import time
+
+# Pre-render invoice PDFs into the cache after writes (0 disables)
+PDF_WARM_ON_WRITE = int(os.getenv('PDF_WARM_ON_WRITE', '1'))
+# Quiet period after the last write before rendering, so a burst of edits renders once
+PDF_WARM_DELAY = float(os.getenv('PDF_WARM_DELAY', '1.0'))
+
+_pending = {}  # invoice id -> time it becomes due
+_condition = threading.Condition()
+_thread = None
+
+def schedule_pdf_warm(invoice_ids):
+    # Call after the write has committed; the render reads the latest state
+    global _thread
+    if not PDF_WARM_ON_WRITE:
+        return
+    app = current_app._get_current_object()
+    due = time.monotonic() + PDF_WARM_DELAY
+    with _condition:
+        for invoice_id in invoice_ids:
+            _pending[invoice_id] = due
+        if _thread is None:
+            _thread = threading.Thread(target=_run, args=(app,), name='pdf-warmer', daemon=True)
+            _thread.start()
+        _condition.notify()
+
+def _take_due():
+    # Blocks until at least one invoice is due, then removes and returns the due ids
+    with _condition:
+        while True:
+            now = time.monotonic()
+            due = [invoice_id for invoice_id, at in _pending.items() if at <= now]
+            if due:
+                for invoice_id in due:
+                    del _pending[invoice_id]
+                return due
+            _condition.wait(min(_pending.values()) - now if _pending else None)
+
+def warm_invoice_pdfs(invoice_ids):
+    rows = db.session.query(Invoice, Client, Team, effective_status()).outerjoin(
+        Client, and_(Client.id == Invoice.client_id, Client.team_id == Invoice.team_id)
+    ).join(Team, Team.id == Invoice.team_id).filter(Invoice.id.in_(invoice_ids)).all()
+    payloads = []
+    for invoice, client, team, status in rows:
+        if client is None:
+            continue
+        payload = invoice_pdf_payload(invoice, client, team, team_logo_src(team), status)
+        if not pdf_cache.contains(pdf_cache.key(payload)):
+            payloads.append(payload)
+    db.session.rollback()
+    # render_pdfs writes every fresh render back into the cache; the misses
+    # are already known, so skip its lookups to keep the hit ratio honest
+    for _ in render_pdfs(payloads, lookup=False):
+        pass
+    return len(payloads)
+
+def _run(app):
+    while True:
+        invoice_ids = _take_due()
+        with app.app_context():
+            try:
+                warm_invoice_pdfs(invoice_ids)
+            except Exception:
+                logging.exception('Pre-rendering invoice PDFs failed')
+                db.session.rollback()
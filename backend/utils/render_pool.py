@@ -0,0 +1,224 @@
+from concurrent.futures import CancelledError, Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from flask import abort
+from backend.utils.pdf import render_invoice_pdf_payload, render_invoices_pdf
+from backend.utils.pdf_cache import PDF_RENDER_WAIT_TIMEOUT, get_or_render_pdf, pdf_cache, render_once
+import logging
+import multiprocessing
+import threading
+import os
+import sys
+
+# Number of renderer processes; 0 renders inline on the request thread
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(os.cpu_count() or 1)))
+# Renders allowed to wait for a free worker; past that, interactive requests get a 503
+PDF_RENDER_QUEUE_DEPTH = int(os.getenv('PDF_RENDER_QUEUE_DEPTH', str(max(PDF_RENDER_WORKERS, 1) * 4)))
+PDF_RENDER_RETRY_AFTER = int(os.getenv('PDF_RENDER_RETRY_AFTER', '5'))
+# Worker recycling to contain WeasyPrint memory growth (0 disables either limit)
+PDF_WORKER_MAX_TASKS = int(os.getenv('PDF_WORKER_MAX_TASKS', '200'))
+PDF_WORKER_MAX_RSS_MB = int(os.getenv('PDF_WORKER_MAX_RSS_MB', '512'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_render_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            options = {}
+            if PDF_WORKER_MAX_TASKS and sys.version_info >= (3, 11):
+                options['max_tasks_per_child'] = PDF_WORKER_MAX_TASKS
+            # spawn: workers must not inherit the web process's DB connections and threads
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                **options
+            )
+        return _executor
+
+def _recycle(pool, reason):
+    # Swap in a fresh pool; the old one finishes its queued renders and exits
+    global _executor
+    with _executor_lock:
+        if _executor is not pool:
+            return
+        _executor = None
+    logging.warning('Recycling PDF render pool: %s', reason)
+    pool.shutdown(wait=False)
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+def _run_in_worker(fn, *args):
+    # Runs in the renderer process; reports its RSS alongside the result
+    return fn(*args), _rss_bytes()
+
+class _Slots:
+    # Admission control: renders submitted to the pool and not yet finished
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, block):
+        with self._condition:
+            while self.in_use >= self.capacity:
+                if not block:
+                    return False
+                self._condition.wait()
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.in_use -= 1
+            self._condition.notify()
+
+    def available(self):
+        with self._condition:
+            return self.in_use < self.capacity
+
+_slots = _Slots(PDF_RENDER_WORKERS + PDF_RENDER_QUEUE_DEPTH)
+
+def _reject():
+    abort(503, 'PDF rendering is at capacity, try again shortly', retry_after=PDF_RENDER_RETRY_AFTER)
+
+def check_render_capacity():
+    # Fast 503 before starting a streamed export against a saturated pool
+    if PDF_RENDER_WORKERS > 0 and not _slots.available():
+        _reject()
+
+def _settle(future, result=None, exception=None):
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        # Cancelled by its owner in the meantime
+        pass
+
+def _submit(fn, *args, on_result=None):
+    # Caller holds a slot, released once the render finishes. The returned
+    # future resolves to fn's result; cancelling it drops the queued task.
+    pool = get_render_pool()
+    future = Future()
+    try:
+        task = pool.submit(_run_in_worker, fn, *args)
+    except BaseException as e:
+        _slots.release()
+        if isinstance(e, BrokenProcessPool):
+            _recycle(pool, 'a worker died')
+        raise
+
+    def done(task):
+        _slots.release()
+        if task.cancelled():
+            future.cancel()
+            return
+        if task.exception() is not None:
+            if isinstance(task.exception(), BrokenProcessPool):
+                _recycle(pool, 'a worker died')
+            _settle(future, exception=task.exception())
+            return
+        result, rss = task.result()
+        if on_result:
+            on_result(result)
+        if PDF_WORKER_MAX_RSS_MB and rss > PDF_WORKER_MAX_RSS_MB * 1024 * 1024:
+            _recycle(pool, f'a worker exceeded {PDF_WORKER_MAX_RSS_MB} MB RSS')
+        _settle(future, result)
+
+    task.add_done_callback(done)
+    future.add_done_callback(lambda f: f.cancelled() and task.cancel())
+    return future
+
+def _start_render(key, payload):
+    # The PDF is in the cache before render_once() stops handing out the future
+    return _submit(render_invoice_pdf_payload, payload, on_result=lambda pdf_bytes: pdf_cache.put(key, pdf_bytes))
+
+def _start_render_if_admitted(key, payload):
+    if not _slots.acquire(block=False):
+        _reject()
+    return _start_render(key, payload)
+
+def _cached_future(key):
+    pdf_bytes = pdf_cache.get(key)
+    if pdf_bytes is None:
+        return None
+    future = Future()
+    future.set_result(pdf_bytes)
+    return future
+
+def render_pdf(payload, timeout=PDF_RENDER_WAIT_TIMEOUT):
+    # Interactive single-invoice render: cache, then a render already in
+    # flight, then a new pool task if admitted (503 with Retry-After if not).
+    # Raises concurrent.futures.TimeoutError after `timeout` seconds.
+    if PDF_RENDER_WORKERS <= 0:
+        return get_or_render_pdf(payload, timeout)
+    key = pdf_cache.key(payload)
+    while True:
+        pdf_bytes = pdf_cache.get(key)
+        if pdf_bytes is not None:
+            return pdf_bytes
+        future, _ = render_once(key, lambda: _start_render_if_admitted(key, payload))
+        try:
+            return future.result(timeout=timeout)
+        except CancelledError:
+            continue
+
+def render_batch_pdf(payloads):
+    # One combined document, rendered in the pool under the same admission limit
+    if PDF_RENDER_WORKERS <= 0:
+        return render_invoices_pdf(payloads)
+    if not _slots.acquire(block=False):
+        _reject()
+    return _submit(render_invoices_pdf, payloads).result()
+
+def render_pdfs(payloads, window=None, lookup=True):
+    # Yields (payload, pdf_bytes) in input order while at most `window`
+    # renders are in flight, so finished PDFs never pile up in memory.
+    # Cached PDFs are served from disk, renders already in flight elsewhere
+    # are shared, and fresh renders are written back. Batch work waits for
+    # pool capacity instead of being rejected. lookup=False skips the cache
+    # read for payloads the caller already knows are not cached.
+    if PDF_RENDER_WORKERS <= 0:
+        for payload in payloads:
+            yield payload, get_or_render_pdf(payload, lookup=lookup)
+        return
+    window = window or PDF_RENDER_WORKERS * 2
+    pending = deque()
+
+    def finish():
+        done_payload, future, _ = pending.popleft()
+        try:
+            return done_payload, future.result()
+        except CancelledError:
+            # Another batch owned this render and dropped it
+            return done_payload, get_or_render_pdf(done_payload)
+
+    try:
+        for payload in payloads:
+            key = pdf_cache.key(payload)
+            future = _cached_future(key) if lookup else None
+            started = False
+            if future is None:
+                # Wait for a slot outside render_once(), which holds a global lock
+                _slots.acquire(block=True)
+                future, started = render_once(key, lambda: _start_render(key, payload))
+                if not started:
+                    _slots.release()
+            pending.append((payload, future, started))
+            if len(pending) >= window:
+                yield finish()
+        while pending:
+            yield finish()
+    finally:
+        # Consumer went away (client disconnect, error): drop queued work we own
+        for _, future, started in pending:
+            if started:
+                future.cancel()
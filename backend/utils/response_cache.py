@@ -0,0 +1,46 @@
+from flask import make_response, request
+from backend.utils.cache import make_cache
+from backend.utils.data_version import data_version_etag
+from backend.utils.identity import get_current_team_id
+from functools import wraps
+import os
+
+# Rendered GET responses shared by every member of a team. Keys embed the
+# team's data version, so a write makes old entries unreachable and LRU,
+# size and TTL bounds reclaim them.
+response_cache = make_cache(
+    os.getenv('RESPONSE_CACHE_URL'),
+    prefix='fatoora:response:',
+    max_size=int(os.getenv('RESPONSE_CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('RESPONSE_CACHE_TTL', '300')),
+    max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+)
+
+# Recomputed per response rather than replayed from the cache
+UNCACHED_HEADERS = {'content-length', 'set-cookie', 'etag', 'cache-control'}
+
+def _cache_key():
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    # The ETag already carries the negotiated listing format
+    return f'{data_version_etag(get_current_team_id())}:{request.path}?{args}'
+
+def cached_response(view):
+    # Apply under etag_on_data_version; only complete 200 responses are stored
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _cache_key()
+        entry = response_cache.get(key)
+        if entry is not None:
+            response = make_response(entry['body'], entry['status'])
+            response.headers.clear()
+            response.headers.extend(entry['headers'])
+            response.headers['X-Cache'] = 'HIT'
+            return response
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            body = response.get_data(as_text=True)
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in UNCACHED_HEADERS]
+            response_cache.set(key, {'status': 200, 'body': body, 'headers': headers}, size=len(body))
+            response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
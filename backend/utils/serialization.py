@@ -0,0 +1,105 @@
+from flask import Response, abort, make_response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime
+from functools import wraps
+import gzip
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Listing formats, chosen with ?format= or the Accept header
+FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.fatoora.columnar+json',
+    'ndjson': 'application/x-ndjson'
+}
+NDJSON_BATCH_SIZE = 1000
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+def _default(o):
+    if isinstance(o, (date, datetime)):
+        return o.isoformat()
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+def dumps(obj):
+    # Compact JSON bytes; dates as ISO 8601 like serialize_invoice()
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+class FastJSONProvider(DefaultJSONProvider):
+    # jsonify() through orjson when it is installed, keeping Flask's output
+    # conventions (sorted keys, HTTP dates for datetimes)
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+def negotiated_format():
+    # Like response_format(), but an unknown ?format= falls back to Accept
+    fmt = request.args.get('format')
+    if fmt in FORMATS:
+        return fmt
+    best = request.accept_mimetypes.best_match(list(FORMATS.values()), default=FORMATS['json'])
+    return next(name for name, mimetype in FORMATS.items() if mimetype == best)
+
+def response_format():
+    fmt = request.args.get('format')
+    if fmt and fmt not in FORMATS:
+        abort(400, f'format must be one of {", ".join(FORMATS)}')
+    return negotiated_format()
+
+def columnar_response(fields, rows):
+    # {"count": n, "columns": {field: [values...]}}: each key once, not once per row
+    columns = [list(values) for values in zip(*rows)] if rows else [[] for _ in fields]
+    return Response(dumps({'count': len(rows), 'columns': dict(zip(fields, columns))}), mimetype=FORMATS['columnar'])
+
+def _ndjson_chunks(fields, rows, batch_size):
+    lines = []
+    for row in rows:
+        lines.append(dumps(dict(zip(fields, row))))
+        if len(lines) >= batch_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+def ndjson_response(fields, rows, batch_size=NDJSON_BATCH_SIZE):
+    # One JSON object per line, encoded while the server-side cursor is read
+    return Response(stream_with_context(_ndjson_chunks(fields, rows, batch_size)), mimetype=FORMATS['ndjson'])
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # Sync flush so every batch reaches the client as it is produced
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def gzip_negotiated(view):
+    # Outermost decorator: the ETag and response cache see uncompressed bodies
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        response.vary.add('Accept-Encoding')
+        if response.status_code != 200 or 'Content-Encoding' in response.headers or not request.accept_encodings.quality('gzip'):
+            return response
+        if response.is_streamed:
+            chunks = response.response
+            response.response = _gzip_chunks(chunks)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < GZIP_MIN_BYTES:
+                return response
+            response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+    return wrapper
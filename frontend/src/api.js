@@ -4,7 +4,7 @@ function getToken() {
   return localStorage.getItem('jwt');
 }
 
-async function request(method, url, data) {
+async function send(method, url, data) {
   const headers = {
     'Content-Type': 'application/json',
     'Authorization': `Bearer ${getToken()}`,
@@ -21,12 +21,32 @@ async function request(method, url, data) {
     const err = await res.json().catch(() => ({}));
     throw new Error(err.message || res.statusText);
   }
+  return res;
+}
+
+async function request(method, url, data) {
+  const res = await send(method, url, data);
   if (res.status === 204) return null;
   return res.json();
 }
 
+// Follows X-Next-Cursor through a paginated listing and returns every item
+async function getAll(url) {
+  const sep = url.includes('?') ? '&' : '?';
+  const items = [];
+  let cursor = null;
+  do {
+    const page = `${url}${sep}limit=1000${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+    const res = await send('GET', page);
+    items.push(...(await res.json()));
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return items;
+}
+
 export const api = {
   get: (url) => request('GET', url),
+  getAll,
   post: (url, data) => request('POST', url, data),
   put: (url, data) => request('PUT', url, data),
   patch: (url, data) => request('PATCH', url, data),
@@ -136,22 +136,24 @@ function Dashboard() {
     const fetchData = async () => {
       setLoading(true);
       try {
+        const now = new Date();
+        const currentMonth = now.getMonth();
+        const currentYear = now.getFullYear();
+        const lastMonth = currentMonth === 0 ? 11 : currentMonth - 1;
+        const lastMonthYear = currentMonth === 0 ? currentYear - 1 : currentYear;
+        // Trends only need this month and last month
+        const since = `${lastMonthYear}-${String(lastMonth + 1).padStart(2, '0')}-01`;
+        
         const [sum, mon, invoices] = await Promise.all([
           api.get('/dashboard/summary'),
           api.get('/dashboard/monthly-revenue'),
-          api.get('/invoices/'),
+          api.getAll(`/invoices/?created_from=${since}`),
         ]);
         setSummary(sum);
         setMonthly(mon);
         setAllInvoices(invoices);
         
         // Calculate trends
-        const now = new Date();
-        const currentMonth = now.getMonth();
-        const currentYear = now.getFullYear();
-        const lastMonth = currentMonth === 0 ? 11 : currentMonth - 1;
-        const lastMonthYear = currentMonth === 0 ? currentYear - 1 : currentYear;
-        
         // Current month data
         const currentMonthInvoices = getMonthlyData(invoices, currentMonth, currentYear);
         const lastMonthInvoices = getMonthlyData(invoices, lastMonth, lastMonthYear);
@@ -201,7 +203,9 @@ function Dashboard() {
     },
     {
       title: t('total_revenue') || 'Total Revenue',
-      value: summary ? `${summary.total_revenue.toLocaleString()}` : '-',
+      value: summary
+        ? Object.entries(summary.revenue_by_currency).map(([currency, amount]) => `${amount.toLocaleString()} ${currency}`).join(' · ') || '0'
+        : '-',
       trend: trends.total_revenue,
       icon: DollarSign,
       color: "text-green-600",
@@ -115,14 +115,15 @@ function Export() {
   useEffect(() => {
     const fetchStats = async () => {
       try {
+        const currentMonth = new Date().getMonth();
+        const currentYear = new Date().getFullYear();
+        const since = `${currentYear}-${String(currentMonth + 1).padStart(2, '0')}-01`;
         const [summary, invoices] = await Promise.all([
           api.get('/dashboard/summary'),
-          api.get('/invoices/')
+          api.getAll(`/invoices/?created_from=${since}`)
         ]);
         
         // Calculate this month's invoices
-        const currentMonth = new Date().getMonth();
-        const currentYear = new Date().getFullYear();
         const thisMonthInvoices = invoices.filter(invoice => {
           const invoiceDate = new Date(invoice.created_at);
           return invoiceDate.getMonth() === currentMonth && 
@@ -122,7 +122,7 @@ function Invoices() {
     setLoading(true);
     try {
       const [inv, cli] = await Promise.all([
-        api.get('/invoices/'),
+        api.getAll('/invoices/'),
         api.get('/clients/'),
       ]);
       setInvoices(inv);